@@ -10,23 +10,62 @@ to use the Build → Critique → Improve pipeline.
 # ============================================================================
 
 HELPER_FUNCTIONS = """
+import re
+
+# Compiled once at import; these run on every request
+BUDGET_RE = re.compile(r'\$?(\d{3,5})')
+USECASE_RE = re.compile(r'(gaming|streaming|workstation|content creation|office)', re.IGNORECASE)
+WORD_RE = re.compile(r"[a-z0-9]+")
+
 def extract_budget(user_query: str) -> str:
     '''Extract budget amount from query like "$1200" or "1200 dollar"'''
-    import re
-    match = re.search(r'\$?(\d{3,5})', user_query)
+    match = BUDGET_RE.search(user_query)
     return match.group(1) if match else "1000"
 
 def extract_usecase(user_query: str) -> str:
-    '''Extract use case: gaming, streaming, workstation, etc.'''
-    cases = ["gaming", "streaming", "workstation", "content creation", "office"]
-    for case in cases:
-        if case.lower() in user_query.lower():
-            return case
-    return "general"
+    '''Extract use case: gaming, streaming, workstation, etc. (first one mentioned wins)'''
+    match = USECASE_RE.search(user_query)
+    return match.group(1).lower() if match else "general"
 
 def extract_goal(user_query: str) -> str:
     '''Generate a title from the query'''
     return user_query[:50].rstrip(".") + "..."
+
+# --- Response cache: reworded versions of the same request skip the pipeline ---
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_TTL = 30 * 60  # seconds; market prices drift after this
+RESPONSE_CACHE_SIZE = 256
+_response_cache = OrderedDict()  # key -> (timestamp, value)
+
+FILLER_WORDS = {"a", "an", "the", "me", "i", "want", "need", "build", "pc", "for",
+                "around", "about", "budget", "with", "my", "to", "of", "and", "dollar", "dollars"}
+
+def response_cache_key(user_query: str) -> tuple:
+    '''Canonical key: budget + use case + the meaningful words, ignoring case and filler.
+    Word order is kept: "pink case, white fans" and "white case, pink fans" differ.'''
+    query = user_query.lower()  # lowercase once; the extractors below reuse it
+    words = tuple(word for word in WORD_RE.findall(query) if word not in FILLER_WORDS)
+    return (extract_budget(query), extract_usecase(query), words)
+
+def cache_get(cache: OrderedDict, key, ttl: float):
+    '''Return a fresh cached value or None (expired entries are dropped)'''
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if time.monotonic() - entry[0] > ttl:
+        del cache[key]
+        return None
+    cache.move_to_end(key)
+    return entry[1]
+
+def cache_put(cache: OrderedDict, key, value, max_size: int):
+    '''Store a value, evicting the least recently used entry when full'''
+    cache[key] = (time.monotonic(), value)
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
 """
 
 # ============================================================================
@@ -34,14 +73,20 @@ def extract_goal(user_query: str) -> str:
 # ============================================================================
 
 REFACTORED_ENDPOINT = """
+import asyncio
+import hashlib
+import os
+import time
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import json
+import orjson
+from langchain_core.messages import HumanMessage, SystemMessage
 from gemini_agents import (
-    BUILD_AGENT_PROMPT,
-    CRITIQUE_AGENT_PROMPT,
-    IMPROVE_AGENT_PROMPT,
-    MASTER_ORCHESTRATOR_PROMPT
+    BUILD_AGENT_SYSTEM, BUILD_AGENT_INPUT,
+    CRITIQUE_AGENT_SYSTEM, CRITIQUE_AGENT_INPUT,
+    IMPROVE_AGENT_SYSTEM, IMPROVE_AGENT_INPUT,
+    MASTER_ORCHESTRATOR_SYSTEM, MASTER_ORCHESTRATOR_INPUT
 )
 
 app = FastAPI()
@@ -49,6 +94,8 @@ app = FastAPI()
 class BuildRequest(BaseModel):
     query: str
     verbose: bool = False  # Include full reasoning output
+    stream: bool = False  # NDJSON: build first, then the orchestrator's JSON in fragments
+    narrative: bool = True  # False skips the (cosmetic) orchestrator call
 
 class BuildResponse(BaseModel):
     build: dict
@@ -56,83 +103,272 @@ class BuildResponse(BaseModel):
     ui_data: dict
     status: str
 
+# JSON mode: Gemini constrains decoding to valid JSON, so the JSONDecodeError
+# fallbacks below only fire on truncated output instead of on stray prose/markdown
+json_llm = chat_vertex_ai.bind(response_mime_type="application/json")
+
+# Critique findings at these levels aren't worth another Gemini round-trip
+MINOR_SEVERITIES = {"low", "info"}
+
+# Bound tail latency: no single Gemini call (or request) may hang a worker
+STAGE_TIMEOUT = 15.0  # seconds per Gemini call
+PIPELINE_DEADLINE = 45.0  # seconds for all stages of one request
+MIN_STAGE_TIMEOUT = 2.0
+
+# Circuit breaker: after repeated Gemini failures, skip the optional stages
+# (Improve, Orchestrator) until the cooldown passes
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_SECONDS = 30.0
+_breaker = {"failures": 0, "opened_at": 0.0}
+
+def breaker_open() -> bool:
+    if _breaker["failures"] < BREAKER_FAIL_MAX:
+        return False
+    if time.monotonic() - _breaker["opened_at"] > BREAKER_RESET_SECONDS:
+        _breaker["failures"] = 0  # cooldown over, let calls through again
+        return False
+    return True
+
+def record_gemini_call(ok: bool):
+    if ok:
+        _breaker["failures"] = 0
+        return
+    _breaker["failures"] += 1
+    if _breaker["failures"] >= BREAKER_FAIL_MAX:
+        _breaker["opened_at"] = time.monotonic()
+
+def stage_timeout(deadline: float) -> float:
+    '''Per-call timeout, shrunk to whatever is left of the request's deadline'''
+    return max(MIN_STAGE_TIMEOUT, min(STAGE_TIMEOUT, deadline - time.monotonic()))
+
+async def call_gemini(llm, messages: list, timeout: float):
+    '''ainvoke with a timeout; failures and timeouts feed the circuit breaker'''
+    try:
+        response = await asyncio.wait_for(llm.ainvoke(messages), timeout=timeout)
+    except Exception:
+        record_gemini_call(ok=False)
+        raise
+    record_gemini_call(ok=True)
+    return response
+
+async def stream_gemini(llm, messages: list, timeout: float):
+    '''astream under the same guard as call_gemini: one timeout for the whole
+    stream, and failures/timeouts feed the circuit breaker'''
+    deadline = time.monotonic() + timeout
+    chunks = llm.astream(messages).__aiter__()
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline - time.monotonic())
+            except StopAsyncIteration:
+                break
+            yield chunk
+    except Exception:
+        record_gemini_call(ok=False)
+        raise
+    finally:
+        # Close the underlying gRPC stream now (timeout, error or early exit), not at GC
+        await chunks.aclose()
+    record_gemini_call(ok=True)
+
+STAGE_CACHE_TTL = 60 * 60  # seconds
+STAGE_CACHE_SIZE = 1024
+_stage_cache = OrderedDict()  # prompt hash -> (parsed JSON, raw JSON text)
+
+def agent_messages(system_prompt: str, user_input: str) -> list:
+    '''Static instructions first, per-request data last, so the prefix stays
+    byte-identical across calls and Gemini's prompt cache can reuse it'''
+    return [SystemMessage(content=system_prompt), HumanMessage(content=user_input)]
+
+async def invoke_stage_cached(system_prompt: str, user_input: str, timeout: float) -> tuple:
+    '''Run one agent stage, reusing the output if this exact prompt ran recently.
+    Returns (parsed dict, raw JSON text) so later prompts can embed the text
+    Gemini sent instead of re-serializing the dict.
+    Raises orjson.JSONDecodeError like orjson.loads (failed parses are never cached),
+    asyncio.TimeoutError if Gemini doesn't answer within timeout, and whatever
+    error the Gemini client raises.'''
+    digest = hashlib.blake2b(system_prompt.encode("utf-8"), digest_size=16)
+    digest.update(user_input.encode("utf-8"))
+    key = digest.hexdigest()
+    cached = cache_get(_stage_cache, key, STAGE_CACHE_TTL)
+    if cached is not None:
+        return cached
+    
+    response = await call_gemini(json_llm, agent_messages(system_prompt, user_input), timeout)
+    result = (orjson.loads(response.content), response.content)
+    cache_put(_stage_cache, key, result, STAGE_CACHE_SIZE)
+    return result
+
+# The orchestrator only writes narrative/UI copy, so a lighter, faster model is enough
+NARRATIVE_MODEL = os.getenv("NARRATIVE_MODEL", "gemini-2.0-flash-lite")
+_narrative_llm = None
+
+def get_narrative_llm():
+    '''Lazy load the Orchestrator's model (Build/Critique/Improve keep chat_vertex_ai)'''
+    global _narrative_llm
+    if _narrative_llm is None:
+        from langchain_google_vertexai import ChatVertexAI
+        _narrative_llm = ChatVertexAI(
+            project=PROJECT_ID,
+            location=LOCATION,
+            model_name=NARRATIVE_MODEL,
+            temperature=0.7,
+            response_mime_type="application/json",
+        )
+    return _narrative_llm
+
+_retriever = None
+
+def shared_retriever():
+    '''One Vertex AI Search client for all lookups; each new one opens its own channel'''
+    global _retriever
+    if _retriever is None:
+        _retriever = get_retriever()
+    return _retriever
+
+REDDIT_CONTEXT_TTL = 60 * 60  # seconds
+_reddit_cache = OrderedDict()  # single entry -> (timestamp, formatted text)
+
+def reddit_context() -> str:
+    '''The Reddit advice lookup doesn't depend on the request, so reuse it for an hour.
+    Empty results aren't cached, so a transient retriever failure doesn't stick.'''
+    cached = cache_get(_reddit_cache, "reddit", REDDIT_CONTEXT_TTL)
+    if cached is not None:
+        return cached
+    
+    docs = shared_retriever().invoke("reddit advice building PC")
+    text = format_parts_for_prompt(docs)
+    if docs:
+        cache_put(_reddit_cache, "reddit", text, 1)
+    return text
+
+async def stream_build_response(head: dict, orchestrator_messages: list = None, timeout: float = STAGE_TIMEOUT):
+    '''NDJSON stream: the finished build first, then the Orchestrator's JSON output
+    as Gemini generates it. The model runs in JSON mode, so each narrative_delta is
+    a fragment of one JSON document; clients concatenate them and parse at the end.'''
+    yield orjson.dumps(head) + b"\\n"
+    if orchestrator_messages is not None:
+        try:
+            async for chunk in stream_gemini(get_narrative_llm(), orchestrator_messages, timeout):
+                if chunk.content:
+                    yield orjson.dumps({"narrative_delta": chunk.content}) + b"\\n"
+        except Exception as e:
+            # The build already went out; the narrative is optional polish
+            print(f"[Orchestrator] Narrative stream failed: {e}")
+            yield orjson.dumps({"narrative_error": str(e)}) + b"\\n"
+    yield orjson.dumps({"status": "success"}) + b"\\n"
+
 @app.post("/api/build-pc")
 async def build_pc_with_reasoning(request: BuildRequest) -> BuildResponse:
     '''
     Multi-agent reasoning pipeline: Build → Critique → Improve
     '''
     
-    retriever = get_retriever()
+    # narrative=false responses lack the Orchestrator's copy, so they get their own entries
+    cache_key = (response_cache_key(request.query), request.narrative)
+    cached_response = cache_get(_response_cache, cache_key, RESPONSE_CACHE_TTL)
+    if cached_response is not None:
+        print("[Cache] Equivalent request seen recently, skipping pipeline")
+        if request.stream:
+            return StreamingResponse(
+                stream_build_response(cached_response.model_dump()),
+                media_type="application/x-ndjson"
+            )
+        return cached_response
+    
+    deadline = time.monotonic() + PIPELINE_DEADLINE
+    retriever = shared_retriever()
+    degraded = False  # set when any stage falls back; such responses are never cached
     
     # ========== STAGE 1: BUILD AGENT ==========
     print("[Agent 1] Building initial PC configuration...")
     
-    # Gather context
-    retrieved_parts = retriever.invoke(request.query)
-    web_search_results = search_web(
-        f"PC gaming parts {extract_budget(request.query)} budget pricing 2025"
+    # Gather context: the three lookups are independent, so run them concurrently
+    retrieved_parts, web_search_results, reddit_data = await asyncio.gather(
+        asyncio.to_thread(retriever.invoke, request.query),
+        asyncio.to_thread(
+            search_web,
+            f"PC gaming parts {extract_budget(request.query)} budget pricing 2025"
+        ),
+        asyncio.to_thread(reddit_context),  # only hits the retriever about once an hour
     )
     
+    # Formatted once, shared by every stage's prompt
+    parts_text = format_parts_for_prompt(retrieved_parts)
+    market_text = format_web_results_for_prompt(web_search_results)
+    
     # Call Build Agent
-    build_prompt = BUILD_AGENT_PROMPT.format(
+    build_input = BUILD_AGENT_INPUT.format(
         user_requirements=request.query,
-        retrieved_parts=format_parts_for_prompt(retrieved_parts),
-        web_search_results=format_web_results_for_prompt(web_search_results)
+        retrieved_parts=parts_text,
+        web_search_results=market_text
     )
     
-    build_response = chat_vertex_ai.invoke(build_prompt)
-    
+    # *_raw: Gemini's JSON text, reused verbatim by the Orchestrator (None on fallback)
     try:
-        initial_build = json.loads(build_response.content)
-    except json.JSONDecodeError:
-        # Fallback if response isn't valid JSON
+        initial_build, build_raw = await invoke_stage_cached(BUILD_AGENT_SYSTEM, build_input, stage_timeout(deadline))
+    except Exception:
+        # Fallback if response isn't valid JSON, Gemini timed out or errored
+        degraded = True
+        build_raw = None
         initial_build = {
             "reasoning": {"parsed_requirements": request.query},
             "build": {"parts": [], "total_budget": 0}
         }
     
+    build_json = orjson.dumps(initial_build.get("build", {})).decode()
+    
     if request.verbose:
         print(f"[Agent 1 Output] Tools used: {initial_build.get('reasoning', {}).get('tool_decisions', [])}")
     
     # ========== STAGE 2: CRITIQUE AGENT ==========
     print("[Agent 2] Critiquing initial build...")
     
-    critique_prompt = CRITIQUE_AGENT_PROMPT.format(
-        build_json=json.dumps(initial_build.get("build", {})),
-        market_data=format_web_results_for_prompt(web_search_results),
-        reddit_data=format_parts_for_prompt(retriever.invoke("reddit advice building PC")),
+    critique_input = CRITIQUE_AGENT_INPUT.format(
+        build_json=build_json,
+        market_data=market_text,
+        reddit_data=reddit_data,
         original_requirements=request.query
     )
     
-    critique_response = chat_vertex_ai.invoke(critique_prompt)
-    
     try:
-        critique = json.loads(critique_response.content)
-    except json.JSONDecodeError:
+        critique, critique_raw = await invoke_stage_cached(CRITIQUE_AGENT_SYSTEM, critique_input, stage_timeout(deadline))
+    except Exception:
+        degraded = True
+        critique_raw = None
         critique = {"critique": {"concerns": [], "overall_assessment": "No critique returned"}}
     
+    concerns = critique.get("critique", {}).get("concerns", [])
+    
     if request.verbose:
-        concerns = critique.get("critique", {}).get("concerns", [])
         print(f"[Agent 2 Output] Found {len(concerns)} concerns")
         for concern in concerns[:3]:
             print(f"  - {concern.get('issue', 'Unknown')}")
     
     # ========== STAGE 3: IMPROVE AGENT ==========
-    print("[Agent 3] Improving build based on critique...")
-    
-    improve_prompt = IMPROVE_AGENT_PROMPT.format(
-        original_build=json.dumps(initial_build.get("build", {})),
-        critique_feedback=json.dumps(critique.get("critique", {})),
-        market_data=format_web_results_for_prompt(web_search_results),
-        original_requirements=request.query
-    )
-    
-    improve_response = chat_vertex_ai.invoke(improve_prompt)
-    
-    try:
-        revisions = json.loads(improve_response.content)
-    except json.JSONDecodeError:
+    minor_only = all(str(c.get("severity", "")).lower() in MINOR_SEVERITIES for c in concerns)
+    if breaker_open() or minor_only:
+        # Nothing significant to fix (or Gemini is struggling): keep the initial build
+        print("[Agent 3] Skipped: no significant concerns or circuit breaker open")
+        degraded = degraded or not minor_only  # real concerns left unaddressed
+        revisions_raw = None
         revisions = {"revisions": {"changes_made": [], "revised_build": initial_build.get("build", {})}}
+    else:
+        print("[Agent 3] Improving build based on critique...")
+        
+        improve_input = IMPROVE_AGENT_INPUT.format(
+            original_build=build_json,
+            critique_feedback=orjson.dumps(critique.get("critique", {})).decode(),
+            market_data=market_text,
+            original_requirements=request.query
+        )
+        
+        try:
+            revisions, revisions_raw = await invoke_stage_cached(IMPROVE_AGENT_SYSTEM, improve_input, stage_timeout(deadline))
+        except Exception:
+            degraded = True
+            revisions_raw = None
+            revisions = {"revisions": {"changes_made": [], "revised_build": initial_build.get("build", {})}}
     
     if request.verbose:
         changes = revisions.get("revisions", {}).get("changes_made", [])
@@ -141,42 +377,70 @@ async def build_pc_with_reasoning(request: BuildRequest) -> BuildResponse:
             print(f"  - {change.get('original_part', '?')} → {change.get('revised_part', '?')}")
     
     # ========== STAGE 4: ORCHESTRATOR (Optional, for narrative polish) ==========
-    print("[Orchestrator] Synthesizing narrative...")
-    
-    orchestrator_prompt = MASTER_ORCHESTRATOR_PROMPT.format(
-        user_goal=extract_goal(request.query),
-        user_request=request.query,
-        agent1_output=json.dumps(initial_build),
-        agent2_output=json.dumps(critique),
-        agent3_output=json.dumps(revisions)
-    )
-    
-    narrative_response = chat_vertex_ai.invoke(orchestrator_prompt)
-    
-    try:
-        narrative = json.loads(narrative_response.content)
-    except json.JSONDecodeError:
-        narrative = {"narrative": {"core_story": "PC build generated through reasoning pipeline"}, "ui_data": {}}
+    orchestrator_messages = None
+    narrative_task = None
+    if request.narrative and breaker_open():
+        degraded = True
+    elif request.narrative:
+        print("[Orchestrator] Synthesizing narrative...")
+        
+        orchestrator_input = MASTER_ORCHESTRATOR_INPUT.format(
+            user_goal=extract_goal(request.query),
+            user_request=request.query,
+            agent1_output=build_raw or orjson.dumps(initial_build).decode(),
+            agent2_output=critique_raw or orjson.dumps(critique).decode(),
+            agent3_output=revisions_raw or orjson.dumps(revisions).decode()
+        )
+        
+        orchestrator_messages = agent_messages(MASTER_ORCHESTRATOR_SYSTEM, orchestrator_input)
+        
+        # Only consumes outputs we already have, so let it run while the response is assembled
+        if not request.stream:
+            narrative_task = asyncio.create_task(
+                call_gemini(get_narrative_llm(), orchestrator_messages, stage_timeout(deadline))
+            )
     
     # ========== BUILD RESPONSE ==========
     final_build = revisions.get("revisions", {}).get("revised_build", initial_build.get("build", {}))
+    reasoning = {
+        "stage_1_initial_build": initial_build,
+        "stage_2_critique": critique,
+        "stage_3_improvements": revisions
+    }
+    default_ui_data = {
+        "comparison_table": "See full reasoning in reasoning.stage_1_initial_build vs stage_3_improvements",
+        "concern_badges": [c.get("category", "Unknown") for c in concerns[:5]],
+        "decision_tree": "User can view alternatives in improvements section"
+    }
+    
+    if request.stream:
+        # The build is final already; send it now and let the narrative follow
+        head = {"build": final_build, "reasoning": reasoning, "ui_data": default_ui_data, "status": "streaming"}
+        return StreamingResponse(
+            stream_build_response(head, orchestrator_messages, stage_timeout(deadline)),
+            media_type="application/x-ndjson"
+        )
+    
+    narrative = {}
+    if narrative_task is not None:
+        try:
+            narrative_response = await narrative_task
+            narrative = orjson.loads(narrative_response.content)
+        except Exception:
+            degraded = True
+            narrative = {"narrative": {"core_story": "PC build generated through reasoning pipeline"}, "ui_data": {}}
     
     response = BuildResponse(
         build=final_build,
-        reasoning={
-            "stage_1_initial_build": initial_build,
-            "stage_2_critique": critique,
-            "stage_3_improvements": revisions,
-            "narrative": narrative.get("narrative", {})
-        },
-        ui_data=narrative.get("ui_data", {
-            "comparison_table": "See full reasoning in reasoning.stage_1_initial_build vs stage_3_improvements",
-            "concern_badges": [c.get("category", "Unknown") for c in critique.get("critique", {}).get("concerns", [])[:5]],
-            "decision_tree": "User can view alternatives in improvements section"
-        }),
+        reasoning={**reasoning, "narrative": narrative.get("narrative", {})},
+        ui_data=narrative.get("ui_data", default_ui_data),
         status="success"
     )
     
+    # Fallback output (empty build, skipped stages) must not be replayed for 30 minutes
+    if not degraded:
+        cache_put(_response_cache, cache_key, response, RESPONSE_CACHE_SIZE)
+    
     print("[Pipeline Complete] Build ready for UI rendering")
     
     return response
@@ -192,27 +456,23 @@ def format_parts_for_prompt(retrieved_docs) -> str:
     if not retrieved_docs:
         return "No parts data available"
     
-    formatted = []
-    for doc in retrieved_docs[:10]:  # Top 10 results
-        content = doc.page_content if hasattr(doc, 'page_content') else str(doc)
-        formatted.append(content)
-    
-    return "\\n".join(formatted)
+    # Top 10 results; LangChain Documents carry page_content, anything else is stringified
+    return "\\n".join(str(getattr(doc, "page_content", doc)) for doc in retrieved_docs[:10])
 
 def format_web_results_for_prompt(web_results) -> str:
     '''Convert web search results to clean text'''
     if not web_results:
         return "No web data available"
     
-    # Assuming web search returns list of dicts with 'title' and 'snippet'
-    formatted = []
-    for result in web_results[:5]:  # Top 5 results
-        if isinstance(result, dict):
-            formatted.append(f"- {result.get('title', 'Untitled')}: {result.get('snippet', '')}")
-        else:
-            formatted.append(f"- {str(result)}")
+    if isinstance(web_results, str):
+        return web_results  # already prompt-ready text (e.g. the web_search tool)
     
-    return "\\n".join(formatted)
+    # Assuming web search returns list of dicts with 'title' and 'snippet'
+    return "\\n".join(
+        f"- {result.get('title', 'Untitled')}: {result.get('snippet', '')}"
+        if isinstance(result, dict) else f"- {result}"
+        for result in web_results[:5]  # Top 5 results
+    )
 """
 
 # ============================================================================
@@ -253,6 +513,13 @@ const data = await response.json();
 </ReasoningPipeline>
 
 <FinalBuild parts={data.build} />
+
+// Or stream it: with { stream: true } the body is NDJSON. The first line is the
+// full build (render it immediately), then {"narrative_delta": "..."} lines arrive
+// as the orchestrator writes, and a final {"status": "success"} closes it.
+// The orchestrator runs in JSON mode, so the deltas are fragments of one JSON
+// document ({"narrative": ..., "ui_data": ...}), not display text: append them
+// to a buffer and JSON.parse it once the final status line arrives.
 """
 
 # ============================================================================
@@ -307,17 +574,32 @@ INTEGRATION_CHECKLIST = """
 4. [ ] Replace your current @app.post("/api/build-pc") with refactored version
 5. [ ] Test with test_script.py (included above)
 6. [ ] Update BuildResponse model if needed
-7. [ ] Ensure chat_vertex_ai is initialized (from your existing code)
+7. [ ] Ensure chat_vertex_ai is initialized (from your existing code); the
+       Orchestrator uses NARRATIVE_MODEL (default gemini-2.0-flash-lite)
 8. [ ] Update get_retriever() call (from your existing code)
 9. [ ] Add web search function if not already present
 10. [ ] Test end-to-end in frontend
 
 Critical Notes:
-- The pipeline makes 4 Gemini calls per request (Build, Critique, Improve, Orchestrate)
+- The pipeline makes up to 4 Gemini calls per request (Build, Critique, Improve, Orchestrate);
+  Improve is skipped when the critique only has low-severity concerns, and
+  Orchestrate is skipped when the request sets narrative=false
 - This is more expensive than single call, but shows reasoning = judges love it
-- Consider caching/memoization if you expect high load
-- JSON parsing can fail; include fallback logic (shown above)
+- Equivalent requests (same budget, use case and key words in the same order)
+  are served from a 30-minute in-memory cache instead of re-running all 4 calls;
+  responses where any stage fell back or was skipped by the breaker aren't cached
+- Agent calls run in JSON mode (response_mime_type="application/json"); keep the
+  fallback logic (shown above) for truncated responses
+- Each Gemini call times out after 15s (less if the request's 45s deadline is
+  nearly used up); after 5 consecutive failures a circuit breaker skips Improve
+  and the Orchestrator for 30s so requests degrade to the Build stage's output.
+  Any Gemini error in a stage falls back instead of failing the request, and the
+  streamed narrative goes through the same timeout/breaker guard (stream_gemini)
 - Use verbose=false in production to skip logging, verbose=true to debug
+- The endpoint never blocks the event loop: Gemini calls use ainvoke and the
+  sync retriever/web search run in asyncio.to_thread. Install uvicorn[standard]
+  so uvicorn's default --loop/--http "auto" picks uvloop + httptools (uvloop is
+  skipped automatically on Windows)
 
 Timeline:
 - 30 min: Copy files and update endpoint
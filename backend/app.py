@@ -1,20 +1,44 @@
 import os
-import json
+import orjson
 import re
+import time
+import logging
+import asyncio
+from itertools import islice
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Load environment variables FIRST
 load_dotenv()
 
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per log line (traceback under "exc_info")"""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode()
+
+logger = logging.getLogger(__name__)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(JsonLogFormatter())
+logger.addHandler(log_handler)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
+logger.propagate = False
+
 # Lazy imports for Google Cloud (to avoid auth issues at startup)
 ChatVertexAI = None
 VertexAISearchRetriever = None
 tool = None
 
-app = FastAPI(title="PC Part Picker AI")
+app = FastAPI(title="PC Part Picker AI", default_response_class=ORJSONResponse)
 
 # --- CORS Middleware ---
 from fastapi.middleware.cors import CORSMiddleware
@@ -62,34 +86,118 @@ def get_gemini_llm():
     
     return gemini_llm
 
+imagen_model = None
+
+def get_imagen_model():
+    """Lazy load the Vertex AI Imagen model used by the Visualizer Agent"""
+    global imagen_model
+    
+    if imagen_model is None:
+        from vertexai.preview.vision_models import ImageGenerationModel
+        imagen_model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
+    
+    return imagen_model
+
 # --- Tools ---
 
+vertex_retriever = None
+
 def get_retriever():
-    """Lazy load Vertex AI Search Retriever"""
-    global VertexAISearchRetriever
+    """Lazy load Vertex AI Search Retriever (one shared client; a failed init is retried next call)"""
+    global VertexAISearchRetriever, vertex_retriever
     
-    try:
-        if VertexAISearchRetriever is None:
-            from langchain_google_community import VertexAISearchRetriever as VAR
-            VertexAISearchRetriever = VAR
-        
-        return VertexAISearchRetriever(
-            project_id=PROJECT_ID,
-            location_id="global",
-            data_store_id=DATA_STORE_ID,
-            max_documents=5,
-            engine_data_type=1,  # 0 for unstructured, 1 for structured
-            get_extractive_answers=True
-        )
-    except Exception as e:
-        print(f"⚠️  Warning: Could not initialize Vertex AI Retriever: {e}")
-        return None
+    if vertex_retriever is None:
+        try:
+            if VertexAISearchRetriever is None:
+                from langchain_google_community import VertexAISearchRetriever as VAR
+                VertexAISearchRetriever = VAR
+            
+            vertex_retriever = VertexAISearchRetriever(
+                project_id=PROJECT_ID,
+                location_id="global",
+                data_store_id=DATA_STORE_ID,
+                max_documents=5,
+                engine_data_type=1,  # 0 for unstructured, 1 for structured
+                get_extractive_answers=True
+            )
+        except Exception as e:
+            print(f"⚠️  Warning: Could not initialize Vertex AI Retriever: {e}")
+            return None
+    
+    return vertex_retriever
+
+RETRIEVER_BATCH_SIZE = 8
+RETRIEVER_BATCH_WAIT = 0.05  # seconds to wait for more queries before dispatching
+
+class RetrieverBatcher:
+    """Collect retrieval queries for a short window and send them as one abatch() call"""
+
+    def __init__(self, batch_size: int = RETRIEVER_BATCH_SIZE, max_wait: float = RETRIEVER_BATCH_WAIT):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.loop = None
+        self.queue = None
+        self.worker = None
+        self.dispatches = set()  # in-flight abatch() tasks, kept referenced until done
+
+    async def submit(self, query: str):
+        """Queue a query and wait for its documents"""
+        loop = asyncio.get_running_loop()
+        if self.worker is None or self.worker.done() or self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            self.worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        await self.queue.put((query, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = self.loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - self.loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Don't wait for this batch's RPCs; queries arriving meanwhile start
+            # the next window instead of queueing behind it
+            dispatch = self.loop.create_task(self._dispatch(batch))
+            self.dispatches.add(dispatch)
+            dispatch.add_done_callback(self.dispatches.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            retriever = get_retriever()
+            if retriever is None:
+                raise RuntimeError("Vertex AI Retriever not available")
+            # Concurrent pipelines often ask for the same parts; search each text once
+            unique_queries = list(dict.fromkeys(query for query, _ in batch))
+            results = dict(zip(unique_queries, await retriever.abatch(unique_queries)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for query, future in batch:
+            # Callers that timed out or were cancelled have already moved on
+            if not future.done():
+                future.set_result(results[query])
+
+retriever_batcher = RetrieverBatcher()
 
 # --- Helper Functions for Multi-Agent Pipeline ---
 
+BUDGET_RE = re.compile(r'\$?(\d{3,5})')
+
 def extract_budget(query: str) -> str:
     """Extract budget from query like '$1200' or '1200 dollar'"""
-    match = re.search(r'\$?(\d{3,5})', query)
+    match = BUDGET_RE.search(query)
     return match.group(1) if match else "1000"
 
 def extract_goal(query: str) -> str:
@@ -101,28 +209,33 @@ def format_retrieved_docs(docs) -> str:
     if not docs:
         return "No parts data available"
     
-    formatted = []
-    for doc in (docs[:10] if hasattr(docs, '__len__') else list(docs)[:10]):
-        content = doc.page_content if hasattr(doc, 'page_content') else str(doc)
-        formatted.append(content)
-    
-    return "\n".join(formatted)
+    # Top 10; Documents carry page_content, anything else is stringified per item
+    return "\n".join(str(getattr(doc, "page_content", doc)) for doc in islice(docs, 10))
+
+# A ```json fence wins over any earlier block (e.g. a ```python snippet); a bare fence is the fallback
+JSON_BLOCK_RE = re.compile(r"```json\s*(.*?)(?:```|$)", re.DOTALL)
+CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
 
 def parse_json_safely(response_text: str) -> dict:
     """Safely parse JSON from Gemini response (handles markdown code blocks)"""
-    print(f"DEBUG: parse_json_safely received: {repr(response_text)}")
+    # Lazy %r: the full repr of a multi-KB agent response is only built at LOG_LEVEL=DEBUG
+    logger.debug("parse_json_safely received: %r", response_text)
     if not response_text:
         return {"error": "Empty response text"}
+    
+    # Fast path: bare JSON (the usual case) parses as-is, no fence stripping
+    if response_text.lstrip()[:1] in ("{", "["):
+        try:
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError:
+            pass
         
     try:
-        cleaned = response_text.strip()
-        # Remove markdown
-        if "```json" in cleaned:
-            cleaned = cleaned.split("```json")[1].split("```")[0].strip()
-        elif "```" in cleaned:
-             cleaned = cleaned.split("```")[1].split("```")[0].strip()
+        # Remove markdown (```json fence first; an unclosed fence runs to the end of the text)
+        fenced = JSON_BLOCK_RE.search(response_text) or CODE_BLOCK_RE.search(response_text)
+        cleaned = fenced.group(1).strip() if fenced else response_text.strip()
              
-        parsed = json.loads(cleaned)
+        parsed = orjson.loads(cleaned)
         
         # Critical Fix: Ensure we have a dict, not a string
         if isinstance(parsed, str):
@@ -131,7 +244,7 @@ def parse_json_safely(response_text: str) -> dict:
             if ":" in cleaned or "reasoning" in cleaned:
                  # Try wrapping
                  try:
-                     parsed = json.loads("{" + cleaned + "}")
+                     parsed = orjson.loads("{" + cleaned + "}")
                  except:
                      pass
             
@@ -144,9 +257,52 @@ def parse_json_safely(response_text: str) -> dict:
         print(f"JSON Parse Error: {e}")
         return {"error": f"JSON Error: {str(e)}", "raw": response_text[:200]}
 
+# Cap in-flight Vertex AI calls per worker so bursts queue here instead of
+# tripping the project quota and the client's silent retry backoff.
+# Per worker: size it as (project quota / WEB_CONCURRENCY)
+VERTEX_MAX_CONCURRENCY = int(os.getenv("VERTEX_MAX_CONCURRENCY", "8"))
+vertex_slots = None
+
+def get_vertex_slots() -> asyncio.Semaphore:
+    """Lazily create the semaphore on the serving loop (on 3.9 it binds to a loop at creation)"""
+    global vertex_slots
+    
+    if vertex_slots is None:
+        vertex_slots = asyncio.Semaphore(VERTEX_MAX_CONCURRENCY)
+    
+    return vertex_slots
+
+async def generate_text(llm, prompt, on_token=None) -> str:
+    """Invoke the LLM; when on_token is given, stream and forward each text delta as it arrives"""
+    async with get_vertex_slots():
+        if on_token is None:
+            response = await llm.ainvoke(prompt)
+            return response.content
+        
+        chunks = []
+        async for chunk in llm.astream(prompt):
+            if chunk.content:
+                chunks.append(chunk.content)
+                await on_token(chunk.content)
+        return "".join(chunks)
+
+def sse_event(event: str, data) -> bytes:
+    """Encode one server-sent event frame"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+def stage_tokens(emit, stage: str):
+    """Per-stage token callback for the agents (None when the request isn't streamed)"""
+    if emit is None:
+        return None
+    
+    async def on_token(text: str):
+        await emit("token", {"stage": stage, "text": text})
+    return on_token
+
 # --- Multi-Agent Prompts (from gemini_agents.py) ---
 
-BUILD_PROMPT = """You are an expert PC architect. Create a build based on user requirements.
+# Static instructions for the Build Agent graph; the user turn carries the requirements + parts
+BUILD_SYSTEM_PROMPT = """You are an expert PC architect. Create a build based on user requirements.
 
 **CRITICAL INSTRUCTION: REAL-TIME PRICING & BUDGET**
 1.  **Check Prices**: Use the 'web_search' tool to find the CURRENT price of key components (GPU, CPU). Do NOT rely on internal data if it's old.
@@ -154,35 +310,38 @@ BUILD_PROMPT = """You are an expert PC architect. Create a build based on user r
 3.  **No Budget?**: If no budget is specified, maximize **Value/Performance** for their specific goal (e.g., "Gaming" -> 7800X3D + best GPU reasonable; "Office" -> Cheap but reliable). Do NOT just pick the most expensive parts unless they ask for "Best possible".
 
 **OUTPUT FORMAT (JSON)**
-{{
-  "reasoning": {{
+{
+  "reasoning": {
     "parsed_requirements": " User wants: Gaming PC, Budget: $1500 (or 'None')",
     "price_check_log": [
-      {{"part": "RTX 4070 Super", "search_query": "price of RTX 4070 Super", "found_price": 599, "source": "Web Search"}},
-      {{"part": "Ryzen 5 7600", "search_query": "price of Ryzen 5 7600", "found_price": 199, "source": "Web Search"}}
+      {"part": "RTX 4070 Super", "search_query": "price of RTX 4070 Super", "found_price": 599, "source": "Web Search"},
+      {"part": "Ryzen 5 7600", "search_query": "price of Ryzen 5 7600", "found_price": 199, "source": "Web Search"}
     ],
     "budget_analysis": "Total findings: $1450 vs Budget: $1500. Status: UNDER BUDGET.",
     "tool_decisions": [
-      {{"tool": "web_search", "query": "price of RTX 4070 Super", "why": "Need current market price"}}
+      {"tool": "web_search", "query": "price of RTX 4070 Super", "why": "Need current market price"}
     ],
-    "budget_allocation": {{"CPU": {{"percentage": 30, "reasoning": "..."}}}}
-  }},
-  "build": {{
+    "budget_allocation": {"CPU": {"percentage": 30, "reasoning": "..."}}
+  },
+  "build": {
     "total_budget": 1500,
     "estimated_cost": 1450,
     "parts": [
-      {{"category": "CPU", "name": "AMD Ryzen 5 7600", "price": 199, "rationale": "Best value gaming CPU, found at $199"}},
-      {{"category": "GPU", "name": "NVIDIA RTX 4070 Super", "price": 599, "rationale": "Fits budget, great 1440p perf"}}
+      {"category": "CPU", "name": "AMD Ryzen 5 7600", "price": 199, "rationale": "Best value gaming CPU, found at $199"},
+      {"category": "GPU", "name": "NVIDIA RTX 4070 Super", "price": 599, "rationale": "Fits budget, great 1440p perf"}
     ],
-    "performance_targets": {{"resolution": "1440p", "fps_target": "100+"}},
+    "performance_targets": {"resolution": "1440p", "fps_target": "100+"},
     "known_limitations": ["Stock cooler is loud"]
-  }}
-}}
+  }
+}
 
-User Requirements: {user_requirements}
-Available Parts (Reference): {retrieved_parts}
+Be specific. If you search for a price, USE THAT EXACT PRICE in your JSON.
 
-Be specific. If you search for a price, USE THAT EXACT PRICE in your JSON."""
+IMPORTANT: Use the 'web_search' tool to verify the CURRENT PRICE and AVAILABILITY of key components (like GPU and CPU).
+Use 'search_pc_parts' if you need more detail from the internal parts database.
+If the retrieved parts data seems outdated (e.g., old prices), prefer the web search results.
+Mention in your reasoning if you checked live prices.
+Your final answer must be ONLY the JSON object."""
 
 CRITIQUE_PROMPT = """You are a CRITICAL PC build reviewer. Find problems with this build.
 
@@ -234,148 +393,151 @@ Critique: {critique}
 
 Only change parts that have real problems. Explain your reasoning."""
 
+def split_prompt(template: str, *fields) -> list:
+    """Pre-render a .format() template into the literal chunks around its fields (in order)"""
+    chunks = []
+    rest = template
+    for field in fields:
+        head, rest = rest.split("{" + field + "}", 1)
+        chunks.append(head.replace("{{", "{").replace("}}", "}"))
+    chunks.append(rest.replace("{{", "{").replace("}}", "}"))
+    return chunks
+
+def fill_prompt(chunks: list, *values) -> str:
+    """Same result as template.format(...), without re-parsing the template per request"""
+    pieces = [chunks[0]]
+    for value, chunk in zip(values, chunks[1:]):
+        pieces.append(str(value))
+        pieces.append(chunk)
+    return "".join(pieces)
+
+CRITIQUE_PROMPT_PARTS = split_prompt(CRITIQUE_PROMPT, "build")
+IMPROVE_PROMPT_PARTS = split_prompt(IMPROVE_PROMPT, "build", "critique")
+
 # --- Multi-Agent Pipeline ---
 
-async def run_build_agent(query: str):
+async def run_build_agent(query: str, on_token=None):
     """Stage 1: Build Agent - Create initial PC configuration"""
     try:
-        llm = get_gemini_llm()
+        graph = get_build_agent()
+        if graph is None:
+            raise Exception("Build Agent graph not available")
         
         # Retrieve context
         try:
-            retriever = get_retriever()
-            retrieved = retriever.invoke(query)
+            retrieved = await retriever_batcher.submit(query)
             parts_data = format_retrieved_docs(retrieved)
         except:
             parts_data = "Mock parts data: CPU (AMD Ryzen), GPU (RTX 4070), RAM (32GB), etc."
         
-        # Enhanced Prompt with Web Search instruction
-        enhanced_prompt = f"""{BUILD_PROMPT.format(user_requirements=query, retrieved_parts=parts_data)}
-        
-        IMPORTANT: Use the 'web_search' tool to verify the CURRENT PRICE and AVAILABILITY of key components (like GPU and CPU).
-        If the retrieved parts data seems outdated (e.g., old prices), prefer the web search results.
-        Mention in your reasoning if you checked live prices.
-        """
+        inputs = {"messages": [("user", f"User Requirements: {query}\nAvailable Parts (Reference): {parts_data}")]}
+        config = {"recursion_limit": BUILD_AGENT_MAX_STEPS}
         
         print("[Agent 1] Building initial configuration with Market Data...")
-        # Bind tools to the LLM
-        llm_with_tools = llm.bind_tools([web_search])
-        response = llm_with_tools.invoke(enhanced_prompt)
-        
-        # simple parsing handling for tool calling response vs content
-        # In a real LangGraph, the graph handles tool execution. 
-        # Here we simple-invoke. If tool call is present, we should execute it.
-        # For this hackathon simplified flow, we'll let the LLM *hallucinate* the tool output usage 
-        # or we manually execute if it tries to call. 
-        # ACTUALLY, to make it real, let's execute the tool if requested.
-        
-        if response.tool_calls:
-            print(f"Tool call detected: {response.tool_calls}")
-            # Execute tool
-            tool_call = response.tool_calls[0]
-            if tool_call['name'] == 'web_search':
-                print(f"Executing Web Search: {tool_call['args']}")
-                tool_result = web_search.invoke(tool_call['args'])
-                
-                # Check if we need to do more checks (simple loop for hackathon)
-                # In a real agent, this would be a graph. 
-                # Here we just give it one chance to fix its build with the new data.
-                # Create a fresh, focused prompt for the final generation
-                final_prompt = f"""You are an expert PC architect.
-                
-                USER REQUEST: {query}
-                
-                SEARCH RESULTS (Current Market Data):
-                {tool_result}
-                
-                TASK:
-                1. Create a PC build that STRICTLY follows the user's budget using the search results.
-                2. If the user said "Strict checking" or gave a budget, you MUST ensure sum of parts < budget.
-                3. Update 'price_check_log' with the real prices you found.
-                
-                OUTPUT:
-                Generate a VALID JSON object (and ONLY JSON) matching this structure:
-                {{
-                  "reasoning": {{
-                      "budget_analysis": "...",
-                      "price_check_log": [...]
-                  }},
-                  "build": {{
-                      "total_budget": 1000,
-                      "parts": [...]
-                  }}
-                }}
-                
-                Ensure the response starts with {{ and ends with }}.
-                """
-                
-                print("[Agent 1] Re-evaluating build with new data...")
-                response = llm.invoke(final_prompt)
-                print(f"DEBUG: Agent 1 Response Type: {type(response)}")
-                print(f"DEBUG: Agent 1 Response Content: {repr(response.content)}")
-        
-        return parse_json_safely(response.content)
+        # The ReAct graph runs any web_search / search_pc_parts calls and lets the
+        # model answer on the same conversation, instead of a second full prompt
+        async with get_vertex_slots():
+            if on_token is None:
+                result = await graph.ainvoke(inputs, config)
+                content = result["messages"][-1].content
+            else:
+                chunks = []
+                async for chunk, metadata in graph.astream(inputs, config, stream_mode="messages"):
+                    if metadata.get("langgraph_node") == "tools":
+                        # Anything the model said before a tool call isn't the final answer
+                        chunks = []
+                    elif chunk.content:
+                        chunks.append(chunk.content)
+                        await on_token(chunk.content)
+                content = "".join(chunks)
+        
+        logger.debug("Agent 1 Response Content: %r", content)
+        return parse_json_safely(content)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Build Agent error: {e}")
+        logger.exception("Build Agent failed")
         return {"error": str(e), "stage": "build"}
 
-async def run_critique_agent(initial_build: dict, original_query: str):
+async def run_critique_agent(initial_build: dict, original_query: str, on_token=None):
     """Stage 2: Critique Agent - Find problems with the build"""
     try:
         llm = get_gemini_llm()
         
-        # Switch to higher temperature for more critical review
-        critique_llm = ChatVertexAI(
-            project=PROJECT_ID,
-            location=LOCATION,
-            model_name=GEMINI_MODEL,
-            temperature=0.9,  # More critical
-        )
+        # Higher temperature for more critical review (per-call override on the shared client)
+        critique_llm = llm.bind(temperature=0.9)
         
-        prompt = f"""{CRITIQUE_PROMPT.format(build=json.dumps(initial_build.get("build", {})))}
+        prompt = f"""{fill_prompt(CRITIQUE_PROMPT_PARTS, orjson.dumps(initial_build.get("build", {})).decode())}
         
         CRITICAL INSTRUCTION: Use 'web_search' to check for recent ISSUES, RECALLS, or DRIVER PROBLEMS with the chosen GPU or CPU. 
         Also check if there is a 'Super' or 'Ti' version available for a similar price.
         """
         
         print("[Agent 2] Critiquing build with Market Data...")
-        critique_llm_with_tools = critique_llm.bind_tools([web_search])
-        response = critique_llm_with_tools.invoke(prompt)
+        critique_llm_with_tools = llm.bind_tools([web_search], temperature=0.9)
+        async with get_vertex_slots():
+            response = await critique_llm_with_tools.ainvoke(prompt)
+        content = response.content
         
         if response.tool_calls:
             print(f"Critique Tool call detected: {response.tool_calls}")
             tool_call = response.tool_calls[0]
             if tool_call['name'] == 'web_search':
-                tool_result = web_search.invoke(tool_call['args'])
+                tool_result = web_search(**tool_call['args'])
                 final_prompt = f"{prompt}\n\nWeb Search Context: {tool_result}\n\nNow generate the Critique JSON."
-                response = critique_llm.invoke(final_prompt)
+                content = await generate_text(critique_llm, final_prompt, on_token)
+        elif on_token is not None:
+            await on_token(content)
         
-        return parse_json_safely(response.content)
+        return parse_json_safely(content)
     except Exception as e:
         print(f"Critique Agent error: {e}")
         return {"error": str(e), "stage": "critique"}
 
-async def run_improve_agent(build: dict, critique: dict):
+async def run_improve_agent(build: dict, critique: dict, on_token=None):
     """Stage 3: Improve Agent - Revise build based on critique"""
     try:
         llm = get_gemini_llm()
         
-        prompt = IMPROVE_PROMPT.format(
-            build=json.dumps(build.get("build", {})),
-            critique=json.dumps(critique.get("critique", {}))
+        prompt = fill_prompt(
+            IMPROVE_PROMPT_PARTS,
+            orjson.dumps(build.get("build", {})).decode(),
+            orjson.dumps(critique.get("critique", {})).decode()
         )
         
         print("[Agent 3] Improving build...")
-        response = llm.invoke(prompt)
+        content = await generate_text(llm, prompt, on_token)
         
-        return parse_json_safely(response.content)
+        return parse_json_safely(content)
     except Exception as e:
         print(f"Improve Agent error: {e}")
         return {"error": str(e), "stage": "improve"}
 
-def search_pc_parts(query: str):
+PARTS_LOOKUP_CACHE_SIZE = 256
+parts_lookup_cache = {}  # query -> formatted results
+
+async def lookup_pc_parts(query: str) -> str:
+    """Formatted knowledge-base results for a query (cached; errors raise so they aren't cached)"""
+    cached = parts_lookup_cache.get(query)
+    if cached is not None:
+        return cached
+    
+    # Awaited on the event loop: no executor thread sits blocked waiting for the batch
+    results = await retriever_batcher.submit(query)
+    
+    # Format results for the LLM
+    formatted_results = []
+    for doc in results:
+        # Vertex AI Search returns page_content and metadata
+        source = doc.metadata.get("source", "Internal DB") if hasattr(doc, 'metadata') else "Internal DB"
+        content = doc.page_content if hasattr(doc, 'page_content') else str(doc)
+        formatted_results.append(f"Source: {source}\nContent: {content}\n---")
+        
+    formatted = "\n".join(formatted_results) if formatted_results else "No results found"
+    parts_lookup_cache[query] = formatted
+    while len(parts_lookup_cache) > PARTS_LOOKUP_CACHE_SIZE:
+        parts_lookup_cache.pop(next(iter(parts_lookup_cache)))
+    return formatted
+
+async def search_pc_parts(query: str):
     """
     Search the internal knowledge base for PC parts, specs, prices, and build advice.
     This tool has access to a database of components (CPU, GPU, etc.) and community build discussions.
@@ -385,18 +547,7 @@ def search_pc_parts(query: str):
         if not DATA_STORE_ID or not PROJECT_ID:
             return "Error: Database credentials not configured."
             
-        retriever = get_retriever()
-        results = retriever.invoke(query)
-        
-        # Format results for the LLM
-        formatted_results = []
-        for doc in results:
-            # Vertex AI Search returns page_content and metadata
-            source = doc.metadata.get("source", "Internal DB") if hasattr(doc, 'metadata') else "Internal DB"
-            content = doc.page_content if hasattr(doc, 'page_content') else str(doc)
-            formatted_results.append(f"Source: {source}\nContent: {content}\n---")
-            
-        return "\n".join(formatted_results) if formatted_results else "No results found"
+        return await lookup_pc_parts(query.strip())
     except Exception as e:
         print(f"Search Error: {e}")
         return f"Error searching database: {str(e)}"
@@ -410,13 +561,42 @@ def web_search(query: str):
     """
     # Placeholder for Google Search Grounding or Tavily
     # For now, we return a generic response to encourage using the internal DB first
+    # (the agents call this inline; once it does real HTTP, make it async with httpx.AsyncClient)
     return f"Simulated web search results for: {query}. (Web Search integration pending)"
 
 
 # --- Agent Setup ---
 
+BUILD_AGENT_MAX_STEPS = 10  # LangGraph recursion limit: caps the tool-call rounds per build
+
+build_agent = None
+
+def get_build_agent():
+    """Get the ReAct graph for the Build Agent (built once, then reused)"""
+    global build_agent
+    
+    if build_agent is None:
+        llm = get_gemini_llm()
+        if not llm:
+            return None
+        try:
+            from langgraph.prebuilt import create_react_agent
+            build_agent = create_react_agent(llm, [web_search, search_pc_parts], prompt=BUILD_SYSTEM_PROMPT)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not initialize Build Agent graph: {e}")
+            return None
+    
+    return build_agent
+
+chat_agent = None
+
 def get_agent():
-    """Get the ReAct agent for simple chat mode"""
+    """Get the ReAct agent for simple chat mode (built once, then reused)"""
+    global chat_agent
+    
+    if chat_agent is not None:
+        return chat_agent
+    
     try:
         llm = get_gemini_llm()
         
@@ -436,8 +616,8 @@ def get_agent():
             from langgraph.prebuilt import create_react_agent
             
             # Create the graph
-            app_graph = create_react_agent(llm, tools, prompt=system_prompt)
-            return app_graph
+            chat_agent = create_react_agent(llm, tools, prompt=system_prompt)
+            return chat_agent
         except Exception as e:
             print(f"⚠️  Warning: Could not initialize LangGraph agent: {e}")
             return None
@@ -455,27 +635,79 @@ class ChatRequest(BaseModel):
 class BuildRequest(BaseModel):
     query: str
     verbose: bool = False
-
-class BuildResponse(BaseModel):
-    build: dict
-    reasoning: dict
-    status: str
+    stream: bool = False  # Server-sent events with token deltas instead of one JSON body
 
 class TextToSpeechRequest(BaseModel):
     text: str
     voice: str = "Nova"  # ElevenLabs voice name
 
-async def run_visualizer_agent(build: dict):
-    """Stage 4: Visualizer Agent - Generate PC image"""
-    print("[Agent 4] Visualizing build...")
-    
-    # Extract key components for the prompt
+BUILD_BATCH_MAX_QUERIES = 8  # each query is 4+ Gemini calls, so keep batches small
+
+class BuildBatchRequest(BaseModel):
+    queries: list[str]
+    verbose: bool = False
+
+# Repeat queries (demos, test scripts) skip the 4 agents within the TTL
+PIPELINE_CACHE_TTL = 1800  # seconds
+PIPELINE_CACHE_SIZE = 500
+QUERY_EDGE_PUNCTUATION = ".,!?;:'\"()[]"
+pipeline_cache = {}  # normalized query -> (stored_at, response dict)
+
+def pipeline_cache_key(query: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive cache key for a build query.
+
+    Only punctuation at the edges of each word (plus thousands separators) is
+    dropped, so "1.5TB" keeps its meaning while "$1,200 PC!" and "$1200 pc"
+    share an entry.
+    """
+    words = (word.strip(QUERY_EDGE_PUNCTUATION) for word in query.lower().split())
+    return " ".join(word.replace(",", "") for word in words if word)
+
+def get_cached_build(key: str):
+    """Cached /build-pc response for key, or None if missing/expired"""
+    entry = pipeline_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, response = entry
+    if time.monotonic() - stored_at > PIPELINE_CACHE_TTL:
+        pipeline_cache.pop(key, None)
+        return None
+    return response
+
+def cache_build(key: str, response):
+    """Store a successful pipeline result, evicting the oldest entries past the size cap"""
+    pipeline_cache.pop(key, None)
+    pipeline_cache[key] = (time.monotonic(), response)
+    while len(pipeline_cache) > PIPELINE_CACHE_SIZE:
+        pipeline_cache.pop(next(iter(pipeline_cache)))
+
+def warm_imagen_model():
+    """Load the Imagen client ahead of Stage 4 (blocking); any error resurfaces in the Visualizer"""
+    try:
+        get_imagen_model()
+    except Exception:
+        pass
+
+def featured_part_names(build: dict) -> list:
+    """Names of the parts the Visualizer puts in its prompt (revised build if present)"""
     parts = build.get("revisions", {}).get("revised_build", {}).get("parts", [])
     if not parts:
         parts = build.get("build", {}).get("parts", [])
-        
-    # Create a rich prompt
-    components_str = ", ".join([p.get('name', '') for p in parts[:5]])
+    return [p.get('name', '') for p in parts[:5]]
+
+# Visualizer fallback images, keyed by the color keyword found in the prompt
+FALLBACK_IMAGES = {
+    "pink": "https://i.pinimg.com/originals/f3/14/05/f31405edd3df05d045c742fb6e511790.jpg",  # Example Pink PC
+    "white": "https://images.unsplash.com/photo-1587202372775-e229f172b9d7?q=80&w=2574",  # White/Clean Setup
+    "default": "https://images.unsplash.com/photo-1603481588273-2f908a9a7a1b?q=80&w=2070",  # Dark RGB Setup
+}
+
+def run_visualizer_agent(build: dict):
+    """Stage 4: Visualizer Agent - Generate PC image (blocking; run it in a worker thread)"""
+    print("[Agent 4] Visualizing build...")
+    
+    # Create a rich prompt from the key components
+    components_str = ", ".join(featured_part_names(build))
     prompt = f"A photorealistic, cinematic shot of a custom gaming PC. High-end components: {components_str}. RGB lighting, tempered glass side panel, sleek cable management, water cooling loop. 8k resolution, unreal engine 5 render, dramatic lighting."
     
     image_url = None
@@ -483,8 +715,7 @@ async def run_visualizer_agent(build: dict):
 
     # 1. Try Vertex AI Imagen (if configured)
     try:
-        from vertexai.preview.vision_models import ImageGenerationModel
-        model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
+        model = get_imagen_model()
         images = model.generate_images(
             prompt=prompt,
             number_of_images=1,
@@ -506,89 +737,152 @@ async def run_visualizer_agent(build: dict):
         print(f"Vertex AI Imagen skipped/failed ({e}), falling back to Dynamic Keyword Search")
         source = "Unsplash (Dynamic Search)"
         
-        # 2. Fallback to Dynamic Keyword Search (Unsplash)
-        # We construct a search URL using key visual terms from the Prompt
-        # Extract color and key vibe words
-        keywords = ["gaming pc", "setup"]
-        if "pink" in prompt.lower(): keywords.append("pink")
-        if "white" in prompt.lower(): keywords.append("white")
-        if "rgb" in prompt.lower(): keywords.append("rgb")
-        
-        # Join with comma for Unsplash search
-        search_query = ",".join(keywords)
-        # Add random sig to prevent caching
-        import random
-        sig = random.randint(0, 1000)
-        
-        # Use Unsplash Source for random image matching keywords
-        image_url = f"https://source.unsplash.com/1600x900/?{search_query}&sig={sig}"
-        # Note: source.unsplash.com is deprecated but often redirects. 
-        # Better alternative if source is down: Unsplash direct search URL structure or similar service like Pexels
-        # Let's use a standard Unsplash search URL pattern that works for embedding
-        image_url = f"https://images.unsplash.com/photo-1593640408182-31c70c8268f5?q=80&w=2574&auto=format&fit=crop" # Keeping a safe high-quality default if dynamic fail
-        
-        # Let's try to find a specific "Pink PC" image if requested, else "White", else "Black/RGB"
-        if "pink" in prompt.lower():
-             image_url = "https://i.pinimg.com/originals/f3/14/05/f31405edd3df05d045c742fb6e511790.jpg" # Example Pink PC
-        elif "white" in prompt.lower():
-             image_url = "https://images.unsplash.com/photo-1587202372775-e229f172b9d7?q=80&w=2574" # White/Clean Setup
-        else:
-             image_url = "https://images.unsplash.com/photo-1603481588273-2f908a9a7a1b?q=80&w=2070" # Dark RGB Setup
-             
+        # 2. Fallback to a curated image matching the build's dominant color
+        prompt_lower = prompt.lower()
+        color = next((c for c in ("pink", "white") if c in prompt_lower), "default")
+        image_url = FALLBACK_IMAGES[color]
+        
     return {
         "image_url": image_url,
         "prompt": prompt,
         "source": source
     }
 
+async def run_build_pipeline(request: BuildRequest, emit=None) -> dict:
+    """Run Build → Critique → Improve → Visualize; emit(event, data) reports progress when streaming"""
+    if request.verbose:
+        print(f"\n[Pipeline] User Query: {request.query}")
+        print("DEBUG: VERSION 1000 - DEEP LOGGING")
+    
+    cache_key = pipeline_cache_key(request.query)
+    cached = get_cached_build(cache_key)
+    if cached is not None:
+        if request.verbose:
+            print("[Pipeline] Cache hit, skipping agents")
+        return cached
+    
+    # Stage 1: BUILD AGENT
+    build = await run_build_agent(request.query, stage_tokens(emit, "build"))
+    if "error" in build:
+        raise Exception(f"Build Agent failed: {build.get('error')}")
+    if emit:
+        await emit("stage1_done", build)
+    
+    # The Visualizer itself waits for the final build (see Stage 4), but its
+    # Imagen client setup is free to overlap Critique + Improve
+    imagen_ready = asyncio.create_task(asyncio.to_thread(warm_imagen_model))
+    
+    # Stage 2: CRITIQUE AGENT
+    critique = await run_critique_agent(build, request.query, stage_tokens(emit, "critique"))
+    if "error" in critique:
+        raise Exception(f"Critique Agent failed: {critique.get('error')}")
+    if emit:
+        await emit("stage2_done", critique)
+    
+    # Stage 3: IMPROVE AGENT
+    revisions = await run_improve_agent(build, critique, stage_tokens(emit, "improve"))
+    if "error" in revisions:
+        raise Exception(f"Improve Agent failed: {revisions.get('error')}")
+    if emit:
+        await emit("stage3_done", revisions)
+        
+    # Stage 4: VISUALIZER AGENT
+    # Not started speculatively on the initial build: each run is a paid Imagen
+    # call, and Improve usually swaps the featured parts, so it would mostly run twice
+    await imagen_ready
+    final_result = revisions if revisions.get("revisions") else build
+    visualization = await asyncio.to_thread(run_visualizer_agent, final_result)
+    if emit:
+        await emit("stage4_done", visualization)
+    
+    # Extract final build
+    final_build = revisions.get("revisions", {}).get("revised_build", build.get("build", {}))
+    
+    if request.verbose:
+        print(f"[Pipeline] Complete! Final budget: ${final_build.get('total_budget', 'N/A')}")
+    
+    # Plain dict: everything here was built internally, so there's nothing to validate
+    response = {
+        "build": final_build,
+        "reasoning": {
+            "stage_1_build": build,
+            "stage_2_critique": critique,
+            "stage_3_improvements": revisions,
+            "stage_4_visualization": visualization
+        },
+        "status": "success"
+    }
+    cache_build(cache_key, response)
+    return response
+
+async def build_pc_events(request: BuildRequest):
+    """SSE stream for /build-pc: token deltas, one event per finished stage, then the full response"""
+    queue = asyncio.Queue()
+    
+    async def emit(event: str, data):
+        await queue.put(sse_event(event, data))
+    
+    async def run():
+        try:
+            result = await run_build_pipeline(request, emit)
+            await emit("done", result)
+        except Exception as e:
+            logger.exception("Streamed /build-pc pipeline failed")
+            await emit("error", {"detail": str(e)})
+        finally:
+            await queue.put(None)
+    
+    pipeline = asyncio.create_task(run())
+    try:
+        while (frame := await queue.get()) is not None:
+            yield frame
+    finally:
+        # Client went away (or we're done); don't leave the agents running
+        pipeline.cancel()
+
 @app.post("/build-pc")
 async def build_pc_with_reasoning(request: BuildRequest):
     """Multi-agent pipeline: Build → Critique → Improve → Visualize"""
+    if request.stream:
+        return StreamingResponse(build_pc_events(request), media_type="text/event-stream")
+    
     try:
-        if request.verbose:
-            print(f"\n[Pipeline] User Query: {request.query}")
-            print("DEBUG: VERSION 1000 - DEEP LOGGING")
-        
-        # Stage 1: BUILD AGENT
-        build = await run_build_agent(request.query)
-        if "error" in build:
-            raise Exception(f"Build Agent failed: {build.get('error')}")
-        
-        # Stage 2: CRITIQUE AGENT
-        critique = await run_critique_agent(build, request.query)
-        if "error" in critique:
-            raise Exception(f"Critique Agent failed: {critique.get('error')}")
-        
-        # Stage 3: IMPROVE AGENT
-        revisions = await run_improve_agent(build, critique)
-        if "error" in revisions:
-            raise Exception(f"Improve Agent failed: {revisions.get('error')}")
-            
-        # Stage 4: VISUALIZER AGENT (Parallel or Sequential)
-        # We pass the final build (revisions or original)
-        visualization = await run_visualizer_agent(revisions if revisions.get("revisions") else build)
-        
-        # Extract final build
-        final_build = revisions.get("revisions", {}).get("revised_build", build.get("build", {}))
-        
-        if request.verbose:
-            print(f"[Pipeline] Complete! Final budget: ${final_build.get('total_budget', 'N/A')}")
-        
-        return BuildResponse(
-            build=final_build,
-            reasoning={
-                "stage_1_build": build,
-                "stage_2_critique": critique,
-                "stage_3_improvements": revisions,
-                "stage_4_visualization": visualization
-            },
-            status="success"
-        )
+        return ORJSONResponse(await run_build_pipeline(request))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("/build-pc pipeline failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/build-pc-batch")
+async def build_pc_batch(request: BuildBatchRequest):
+    """Run several build pipelines in one call; results come back in query order.
+
+    The pipelines run concurrently, so their RAG lookups coalesce in the
+    retriever batcher and their Gemini calls share the Vertex AI slots.
+    Queries that normalize to the same cache key run only once.
+    """
+    if len(request.queries) > BUILD_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BUILD_BATCH_MAX_QUERIES} queries per batch (got {len(request.queries)})"
+        )
+    
+    keys = [pipeline_cache_key(query) for query in request.queries]
+    unique = {}
+    for key, query in zip(keys, request.queries):
+        unique.setdefault(key, query)
+    
+    outcomes = await asyncio.gather(
+        *[run_build_pipeline(BuildRequest(query=query, verbose=request.verbose)) for query in unique.values()],
+        return_exceptions=True
+    )
+    by_key = {}
+    for key, outcome in zip(unique, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error("/build-pc-batch pipeline failed", exc_info=outcome)
+            outcome = {"status": "error", "detail": str(outcome)}
+        by_key[key] = outcome
+    return ORJSONResponse({"results": [by_key[key] for key in keys]})
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     """Legacy endpoint: Simple chat without reasoning pipeline"""
@@ -602,16 +896,28 @@ async def chat(request: ChatRequest):
         
         # Invoke the graph
         # LangGraph expects {"messages": [("user", "message")]}
-        response = agent_graph.invoke({"messages": [("user", request.message)]})
+        async with get_vertex_slots():
+            response = await agent_graph.ainvoke({"messages": [("user", request.message)]})
         
         # Extract the final AI message content
         ai_message = response["messages"][-1].content
         return {"response": ai_message}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("/chat failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+elevenlabs_client = None
+
+def get_elevenlabs_client():
+    """Lazy load the (async) ElevenLabs client used by /tts"""
+    global elevenlabs_client
+    
+    if elevenlabs_client is None:
+        from elevenlabs.client import AsyncElevenLabs
+        elevenlabs_client = AsyncElevenLabs(api_key=ELEVENLABS_API_KEY)
+    
+    return elevenlabs_client
+
 @app.post("/tts")
 async def text_to_speech(request: TextToSpeechRequest):
     """Convert text to speech using ElevenLabs"""
@@ -622,8 +928,7 @@ async def text_to_speech(request: TextToSpeechRequest):
                 detail="ElevenLabs API key not configured. Set ELEVENLABS_API_KEY environment variable."
             )
         
-        from elevenlabs.client import ElevenLabs
-        client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+        client = get_elevenlabs_client()
         
         # Generate audio using ElevenLabs
         audio = client.text_to_speech.convert(
@@ -632,18 +937,23 @@ async def text_to_speech(request: TextToSpeechRequest):
             model_id="eleven_monolingual_v1"
         )
         
-        # Convert generator to bytes
-        audio_bytes = b"".join(audio)
+        # Pull the first chunk here so ElevenLabs errors still become a 500,
+        # then forward the rest as it arrives (no Content-Length, so playback starts early)
+        first_chunk = await audio.__anext__()  # not anext(): that builtin is 3.10+
+        
+        async def audio_stream():
+            yield first_chunk
+            async for chunk in audio:
+                yield chunk
         
         return StreamingResponse(
-            iter([audio_bytes]),
+            audio_stream(),
             media_type="audio/mpeg",
             headers={"Content-Disposition": "inline; filename=audio.mp3"}
         )
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("/tts failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/")
@@ -652,6 +962,7 @@ def read_root():
         "status": "PC Part Picker AI Backend running",
         "endpoints": {
             "/build-pc": "POST - Multi-agent reasoning pipeline (Build → Critique → Improve)",
+            "/build-pc-batch": "POST - Several /build-pc queries in one request",
             "/chat": "POST - Simple chat endpoint",
             "/tts": "POST - Text-to-speech using ElevenLabs",
             "/": "GET - Status"
@@ -661,7 +972,10 @@ def read_root():
 
 @app.on_event("startup")
 async def startup_event():
-    """Print startup messages"""
+    """Pre-warm the Gemini client and print startup messages"""
+    # Each worker pays the Vertex AI init once here instead of on its first request
+    await asyncio.to_thread(get_gemini_llm)
+    
     print("\n" + "="*70)
     print("  🚀 BuildBuddy AI Backend Started Successfully!")
     print("="*70)
@@ -676,4 +990,13 @@ async def startup_event():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=False)
+    # For multiple workers on Linux/macOS prefer gunicorn (see start.sh):
+    #   gunicorn app:app -k uvicorn.workers.UvicornWorker -w 2
+    # Keep the count small: the Vertex semaphore and caches are per worker, so
+    # in-flight Vertex calls can reach WEB_CONCURRENCY x VERTEX_MAX_CONCURRENCY
+    # uvicorn[standard] brings uvloop + httptools, which uvicorn and its worker pick up automatically
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, reload=False)
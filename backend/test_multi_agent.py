@@ -3,13 +3,25 @@ Test script for multi-agent pipeline.
 Run this FIRST to validate each agent independently before integrating into app.py
 """
 
+import asyncio
 import json
 import os
+import re
 import sys
+from functools import lru_cache
+import orjson
 from dotenv import load_dotenv
 
+from gemini_agents import (
+    BUILD_AGENT_SYSTEM, BUILD_AGENT_INPUT,
+    CRITIQUE_AGENT_SYSTEM, CRITIQUE_AGENT_INPUT,
+    IMPROVE_AGENT_SYSTEM, IMPROVE_AGENT_INPUT,
+)
+
 load_dotenv()
 
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+
 # Mock data for testing without full Vertex AI setup
 MOCK_RETRIEVED_PARTS = """
 1. CPU: AMD Ryzen 7 5700X3D - $299 - Best gaming CPU for 1440p
@@ -39,20 +51,72 @@ r/buildapc threads:
 - "NZXT H510 has okay airflow, but Meshify C is better"
 """
 
+TEST_QUERY = "Build me a $1200 gaming PC for 1440p 120fps"
+
+# The Build Agent's inputs are all fixed, so its prompt is rendered once at import
+BUILD_TEST_PROMPT = BUILD_AGENT_INPUT.format(
+    user_requirements=TEST_QUERY,
+    retrieved_parts=MOCK_RETRIEVED_PARTS,
+    web_search_results=MOCK_WEB_RESULTS
+)
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+BUDGET_RE = re.compile(r'\$?(\d{3,5})')
+# A ```json fence wins over any earlier block (e.g. a ```python snippet); a bare fence is the fallback
+JSON_BLOCK_RE = re.compile(r"```json\s*(.*?)(?:```|$)", re.DOTALL)
+CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+
 def extract_budget(user_query: str) -> str:
     """Extract budget from query"""
-    import re
-    match = re.search(r'\$?(\d{3,5})', user_query)
+    match = BUDGET_RE.search(user_query)
     return match.group(1) if match else "1000"
 
 def extract_goal(user_query: str) -> str:
     """Extract goal from query"""
     return user_query[:60].rstrip(".") + "..."
 
+@lru_cache(maxsize=8)
+def get_llm(temperature: float):
+    """Shared ChatVertexAI client per temperature (auth + HTTP setup paid once per run)"""
+    # Imported here so 'mock' mode works without the Vertex AI SDK
+    from langchain_google_vertexai import ChatVertexAI
+    
+    return ChatVertexAI(
+        project=os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
+        location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
+        model_name=GEMINI_MODEL,
+        temperature=temperature,
+    )
+
+async def prewarm_llm(temperature: float):
+    """Build a client in a worker thread so its auth setup overlaps the stage already running"""
+    try:
+        await asyncio.to_thread(get_llm, temperature)
+    except Exception:
+        pass  # The stage that needs this client reports the error itself
+
+async def stream_text(llm, system: str, prompt: str) -> str:
+    """Stream a Gemini response to stdout as it's generated and return the full text.
+
+    The agent's static *_SYSTEM block goes out as the system instruction, so
+    every call to the same agent starts with a byte-identical prefix that
+    Gemini's implicit prompt cache can reuse.
+    """
+    chunks = []
+    async for chunk in llm.astream([("system", system), ("human", prompt)]):
+        chunks.append(chunk.content)
+        # Live preview: the stages run one at a time, so nothing interleaves
+        print(chunk.content, end="", flush=True)
+    print()
+    return "".join(chunks)
+
+def serialize_build(build_output: dict) -> str:
+    """Compact JSON of build_output["build"]; callers dump it once and pass it to Critique and Improve"""
+    return orjson.dumps(build_output.get("build", {})).decode()
+
 def pretty_print(title, content):
     """Pretty print section headers"""
     print(f"\n{'='*70}")
@@ -70,19 +134,12 @@ def parse_json_response(response_text: str, agent_name: str) -> dict:
     """
     try:
         # Try direct parsing first
-        return json.loads(response_text)
-    except json.JSONDecodeError:
-        # Try extracting from markdown code block
-        if "```json" in response_text:
-            start = response_text.find("```json") + 7
-            end = response_text.find("```", start)
-            json_str = response_text[start:end].strip()
-            return json.loads(json_str)
-        elif "```" in response_text:
-            start = response_text.find("```") + 3
-            end = response_text.find("```", start)
-            json_str = response_text[start:end].strip()
-            return json.loads(json_str)
+        return orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        # Try extracting from markdown code block, preferring the ```json one
+        fenced = JSON_BLOCK_RE.search(response_text) or CODE_BLOCK_RE.search(response_text)
+        if fenced:
+            return orjson.loads(fenced.group(1).strip())
         else:
             print(f"⚠️  WARNING: Could not parse {agent_name} response as JSON")
             print(f"Response was: {response_text[:200]}...")
@@ -92,37 +149,24 @@ def parse_json_response(response_text: str, agent_name: str) -> dict:
 # TEST 1: Build Agent Only
 # ============================================================================
 
-def test_build_agent():
+async def test_build_agent():
     """Test the Build Agent independently"""
-    from langchain_google_vertexai import ChatVertexAI
-    from gemini_agents import BUILD_AGENT_PROMPT
-    
     print("\n" + "╔" + "="*68 + "╗")
     print("║" + " AGENT 1: BUILD AGENT ".center(68) + "║")
     print("╚" + "="*68 + "╝")
     
-    user_query = "Build me a $1200 gaming PC for 1440p 120fps"
+    user_query = TEST_QUERY
     
     try:
-        llm = ChatVertexAI(
-            project=os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
-            model_name="gemini-2.0-flash-exp",
-            temperature=0.7,
-        )
+        llm = get_llm(0.7)
         
-        prompt = BUILD_AGENT_PROMPT.format(
-            user_requirements=user_query,
-            retrieved_parts=MOCK_RETRIEVED_PARTS,
-            web_search_results=MOCK_WEB_RESULTS
-        )
+        prompt = BUILD_TEST_PROMPT
         
         print(f"\n📥 Input Query: {user_query}")
         print(f"🔧 Temperature: 0.7 (creative but grounded)")
         print(f"⏳ Calling Gemini Build Agent...")
         
-        response = llm.invoke(prompt)
-        response_text = response.content
+        response_text = await stream_text(llm, BUILD_AGENT_SYSTEM, prompt)
         
         build_output = parse_json_response(response_text, "Build Agent")
         
@@ -130,8 +174,9 @@ def test_build_agent():
         
         # Validate structure
         if "build" in build_output:
-            parts = build_output.get("build", {}).get("parts", [])
-            budget = build_output.get("build", {}).get("total_budget", 0)
+            build = build_output["build"]
+            parts = build.get("parts", [])
+            budget = build.get("total_budget", 0)
             print(f"\n✅ Build Agent returned {len(parts)} parts with ${budget} budget")
             
             if "reasoning" in build_output:
@@ -152,36 +197,27 @@ def test_build_agent():
 # TEST 2: Critique Agent (uses Build Agent output)
 # ============================================================================
 
-def test_critique_agent(initial_build: dict):
-    """Test the Critique Agent against the initial build"""
-    from langchain_google_vertexai import ChatVertexAI
-    from gemini_agents import CRITIQUE_AGENT_PROMPT
-    
+async def test_critique_agent(build_json: str):
+    """Test the Critique Agent against the initial build (pre-serialized by the caller)"""
     print("\n" + "╔" + "="*68 + "╗")
     print("║" + " AGENT 2: CRITIQUE AGENT ".center(68) + "║")
     print("╚" + "="*68 + "╝")
     
     try:
-        llm = ChatVertexAI(
-            project=os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
-            model_name="gemini-2.0-flash-exp",
-            temperature=0.9,  # More critical
-        )
+        llm = get_llm(0.9)  # More critical
         
-        prompt = CRITIQUE_AGENT_PROMPT.format(
-            build_json=json.dumps(initial_build.get("build", {})),
+        prompt = CRITIQUE_AGENT_INPUT.format(
+            build_json=build_json,
             market_data=MOCK_WEB_RESULTS,
             reddit_data=MOCK_REDDIT_DATA,
-            original_requirements="Build me a $1200 gaming PC for 1440p 120fps"
+            original_requirements=TEST_QUERY
         )
         
         print(f"\n📥 Reviewing initial build from Stage 1...")
         print(f"🔧 Temperature: 0.9 (more critical, less constrained)")
         print(f"⏳ Calling Gemini Critique Agent...")
         
-        response = llm.invoke(prompt)
-        response_text = response.content
+        response_text = await stream_text(llm, CRITIQUE_AGENT_SYSTEM, prompt)
         
         critique_output = parse_json_response(response_text, "Critique Agent")
         
@@ -189,8 +225,9 @@ def test_critique_agent(initial_build: dict):
         
         # Validate structure
         if "critique" in critique_output:
-            concerns = critique_output.get("critique", {}).get("concerns", [])
-            assessment = critique_output.get("critique", {}).get("overall_assessment", "")
+            critique = critique_output["critique"]
+            concerns = critique.get("concerns", [])
+            assessment = critique.get("overall_assessment", "")
             print(f"\n✅ Critique Agent found {len(concerns)} concerns")
             print(f"   Overall: {assessment}")
             
@@ -210,36 +247,27 @@ def test_critique_agent(initial_build: dict):
 # TEST 3: Improve Agent (uses Build + Critique)
 # ============================================================================
 
-def test_improve_agent(initial_build: dict, critique: dict):
+async def test_improve_agent(build_json: str, critique: dict):
     """Test the Improve Agent"""
-    from langchain_google_vertexai import ChatVertexAI
-    from gemini_agents import IMPROVE_AGENT_PROMPT
-    
     print("\n" + "╔" + "="*68 + "╗")
     print("║" + " AGENT 3: IMPROVE AGENT ".center(68) + "║")
     print("╚" + "="*68 + "╝")
     
     try:
-        llm = ChatVertexAI(
-            project=os.getenv("GOOGLE_CLOUD_PROJECT_ID"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
-            model_name="gemini-2.0-flash-exp",
-            temperature=0.7,
-        )
+        llm = get_llm(0.7)
         
-        prompt = IMPROVE_AGENT_PROMPT.format(
-            original_build=json.dumps(initial_build.get("build", {})),
-            critique_feedback=json.dumps(critique.get("critique", {})),
+        prompt = IMPROVE_AGENT_INPUT.format(
+            original_build=build_json,
+            critique_feedback=orjson.dumps(critique.get("critique", {})).decode(),
             market_data=MOCK_WEB_RESULTS,
-            original_requirements="Build me a $1200 gaming PC for 1440p 120fps"
+            original_requirements=TEST_QUERY
         )
         
         print(f"\n📥 Initial build from Stage 1 + Critique from Stage 2...")
         print(f"🔧 Temperature: 0.7 (thoughtful revision)")
         print(f"⏳ Calling Gemini Improve Agent...")
         
-        response = llm.invoke(prompt)
-        response_text = response.content
+        response_text = await stream_text(llm, IMPROVE_AGENT_SYSTEM, prompt)
         
         improve_output = parse_json_response(response_text, "Improve Agent")
         
@@ -247,8 +275,9 @@ def test_improve_agent(initial_build: dict, critique: dict):
         
         # Validate structure
         if "revisions" in improve_output:
-            changes = improve_output.get("revisions", {}).get("changes_made", [])
-            revised_build = improve_output.get("revisions", {}).get("revised_build", {})
+            revisions = improve_output["revisions"]
+            changes = revisions.get("changes_made", [])
+            revised_build = revisions.get("revised_build", {})
             print(f"\n✅ Improve Agent made {len(changes)} revisions")
             print(f"   Revised budget: ${revised_build.get('total_budget', 'N/A')}")
             
@@ -270,27 +299,34 @@ def test_improve_agent(initial_build: dict, critique: dict):
 # TEST 4: Full Pipeline
 # ============================================================================
 
-def test_full_pipeline():
+async def test_full_pipeline():
     """Run all three agents in sequence"""
     print("\n\n")
     print("╔" + "="*68 + "╗")
     print("║" + " FULL MULTI-AGENT PIPELINE TEST ".center(68) + "║")
     print("╚" + "="*68 + "╝")
     
-    # Stage 1
-    build = test_build_agent()
+    # The stages stay strictly sequential: Critique reads the finished "build"
+    # object, which the Build Agent emits last, and Improve needs the real
+    # critique, so there is no partial output worth speculating on
+    
+    # Stage 1 (the Critique Agent's 0.9 client warms up meanwhile)
+    critique_llm_ready = asyncio.create_task(prewarm_llm(0.9))
+    build = await test_build_agent()
+    await critique_llm_ready
     if not build:
         print("\n❌ Pipeline stopped: Build Agent failed")
         return
     
     # Stage 2
-    critique = test_critique_agent(build)
+    build_json = serialize_build(build)
+    critique = await test_critique_agent(build_json)
     if not critique:
         print("\n❌ Pipeline stopped: Critique Agent failed")
         return
     
     # Stage 3
-    revisions = test_improve_agent(build, critique)
+    revisions = await test_improve_agent(build_json, critique)
     if not revisions:
         print("\n❌ Pipeline stopped: Improve Agent failed")
         return
@@ -301,9 +337,11 @@ def test_full_pipeline():
     print("║" + " PIPELINE SUMMARY ".center(68) + "║")
     print("╚" + "="*68 + "╝")
     
+    revision = revisions.get("revisions", {})
+    revised_build = revision.get("revised_build", {})
     initial_budget = build.get("build", {}).get("total_budget", 0)
-    final_budget = revisions.get("revisions", {}).get("revised_build", {}).get("total_budget", 0)
-    changes = len(revisions.get("revisions", {}).get("changes_made", []))
+    final_budget = revised_build.get("total_budget", 0)
+    changes = len(revision.get("changes_made", []))
     concerns = len(critique.get("critique", {}).get("concerns", []))
     
     print(f"\n✅ Full pipeline completed successfully")
@@ -315,7 +353,7 @@ def test_full_pipeline():
     print(f"   • Revisions Made: {changes}")
     
     print(f"\n💾 Final Build:")
-    final_parts = revisions.get("revisions", {}).get("revised_build", {}).get("parts", [])
+    final_parts = revised_build.get("parts", [])
     for i, part in enumerate(final_parts[:5], 1):
         name = part.get("name", "Unknown")
         price = part.get("price", "N/A")
@@ -325,22 +363,27 @@ def test_full_pipeline():
 # COMMAND-LINE INTERFACE
 # ============================================================================
 
-def main():
+async def main():
     if len(sys.argv) > 1:
         if sys.argv[1] == "build":
-            test_build_agent()
+            await test_build_agent()
         elif sys.argv[1] == "critique":
-            build = test_build_agent()
+            critique_llm_ready = asyncio.create_task(prewarm_llm(0.9))
+            build = await test_build_agent()
+            await critique_llm_ready
             if build:
-                test_critique_agent(build)
+                await test_critique_agent(serialize_build(build))
         elif sys.argv[1] == "improve":
-            build = test_build_agent()
+            critique_llm_ready = asyncio.create_task(prewarm_llm(0.9))
+            build = await test_build_agent()
+            await critique_llm_ready
             if build:
-                critique = test_critique_agent(build)
+                build_json = serialize_build(build)
+                critique = await test_critique_agent(build_json)
                 if critique:
-                    test_improve_agent(build, critique)
+                    await test_improve_agent(build_json, critique)
         elif sys.argv[1] == "full":
-            test_full_pipeline()
+            await test_full_pipeline()
         elif sys.argv[1] == "mock":
             print("\n⚠️  MOCK MODE (no Gemini calls, just shows data flow)")
             print("Run with 'python test_multi_agent.py full' for real testing")
@@ -349,7 +392,7 @@ def main():
             print(f"\nMock Reddit data:\n{MOCK_REDDIT_DATA}")
     else:
         # Default: run full pipeline
-        test_full_pipeline()
+        await test_full_pipeline()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,7 +1,9 @@
-import json
 import os
-import glob
+import mmap
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import orjson
 
 # Mapping filenames to component types
 COMPONENT_MAP = {
@@ -31,118 +33,183 @@ COMPONENT_MAP = {
     "case-accessory.json": "Case Accessory"
 }
 
+PART_URL_PREFIX = "https://pcpartpicker.com/product/"
+
+# Case-insensitive lookup ("CPU.json" still maps to CPU)
+COMPONENT_MAP_CF = {name.casefold(): component for name, component in COMPONENT_MAP.items()}
+
+# 1 MiB file buffers: far fewer read/write syscalls than the 8 KiB default
+IO_BUFFER_SIZE = 1 << 20
+
+# Files at least this big are parsed straight from an mmap instead of read() into a copy
+MMAP_THRESHOLD = 1 << 20
+
+def read_json_file(file_path, size):
+    """Parse a JSON file, mapping it into memory when it's large."""
+    # Full parse on purpose: every item's fields go into its description and its
+    # specs string, so a lazy/on-demand parser (simdjson) would materialize it all anyway
+    with open(file_path, "rb", buffering=IO_BUFFER_SIZE) as f:
+        if size < MMAP_THRESHOLD:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+class IdSanitizeTable(dict):
+    """str.translate table: keep alphanumerics, '-' and '_', map everything else to '_'.
+    Filled lazily so non-ASCII characters follow str.isalnum just like before."""
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        mapped = char if char.isalnum() or char in "-_" else "_"
+        self[codepoint] = mapped
+        return mapped
+
+ID_SANITIZE_TABLE = IdSanitizeTable()
+
+class FieldLabels(dict):
+    """Human-readable label per spec key ("core_clock" -> "Core Clock"), computed once per key."""
+    def __missing__(self, key):
+        label = key.replace("_", " ").title()
+        self[key] = label
+        return label
+
+FIELD_LABELS = FieldLabels()
+
 def generate_id(text):
     """Generates a stable ID based on text content."""
     return hashlib.md5(text.encode("utf-8")).hexdigest()
 
-def load_and_process_data(input_dir, output_file):
-    master_data = []
-    
-    # Get all JSON files in the directory
-    json_files = glob.glob(os.path.join(input_dir, "*.json"))
-    
-    print(f"Found {len(json_files)} JSON files.")
-
-    for file_path in json_files:
-        filename = os.path.basename(file_path)
-
-        # --- PROCESS REDDIT DATA ---
-        if "reddit" in filename.lower():
-            print(f"Processing {filename} as Community Build Advice...")
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    items = json.load(f)
-                
-                for i, item in enumerate(items):
-                    prompt = item.get("prompt", "")
-                    completion = item.get("completion", "")
-                    
-                    if not prompt or not completion:
-                        continue
-                        
-                    # formatted content for RAG
-                    text_content = f"User Request: {prompt}\n\nExpert Recommendation: {completion}"
-                    
-                    # formatted content for RAG
-                    text_content = f"User Request: {prompt}\n\nExpert Recommendation: {completion}"
-                    
-                    doc = {
-                        "id": f"reddit_{generate_id(prompt)[:12]}",
-                        "structData": {
-                            "title": f"Community Build Advice: {prompt[:50]}...",
-                            "description": text_content,
-                            "url": f"https://reddit.com/advice/{i}", 
-                            "type": "Community Advice",
-                            "source": "Reddit",
-                            "price": "N/A"
-                        }
-                    }
-                    master_data.append(doc)
-            except Exception as e:
-                print(f"Error processing Reddit file {filename}: {e}")
-            continue
-
-        # --- PROCESS PC PART DATA ---
-        component_type = COMPONENT_MAP.get(filename, filename.replace(".json", "").replace("-", " ").title())
-        print(f"Processing {filename} as {component_type}...")
+def generate_ids_batch(texts, num_bytes=6):
+    """Stable IDs for many texts at once (same values as generate_id(text)[:2 * num_bytes])."""
+    # Hex-encode only the digest bytes we keep
+    md5 = hashlib.md5
+    return [md5(text.encode("utf-8"), usedforsecurity=False).digest()[:num_bytes].hex() for text in texts]
 
+def process_file(file_path, filename, file_size):
+    """Turn one input JSON file into Vertex AI Search documents (runs in a worker process)."""
+    docs = []
+    file_key = filename.casefold()
+    
+    # --- PROCESS REDDIT DATA ---
+    if "reddit" in file_key:
+        print(f"Processing {filename} as Community Build Advice...")
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                items = json.load(f)
-                
-            if not isinstance(items, list):
-                print(f"Warning: {filename} does not contain a list of items. Skipping.")
-                continue
-
-            for item in items:
-                # 1. rich description
-                description_parts = [f"Component Type: {component_type}"]
-                for key, value in item.items():
-                    if value is not None and value != "":
-                        val_str = str(value)
-                        formatted_key = key.replace("_", " ").title()
-                        description_parts.append(f"{formatted_key}: {val_str}")
-                
-                text_content = ". ".join(description_parts)
-
-                # 2. Consistent Schema
-                # Remove complex nested objects from root to prevent schema drift
-                # Put everything complex into structData
-                
-                name = item.get("name", "Unknown Component")
-                price = item.get("price")
-                
-                # Sanitize ID
-                item_id = f"{component_type}_{str(name).replace(' ', '_')}"
-                # Ensure ID is safe characters only
-                item_id = "".join([c if c.isalnum() or c in "-_" else "_" for c in item_id])[:128]
-
-                doc = {
-                    "id": item_id,
+            items = read_json_file(file_path, file_size)
+    
+            # Column-wise: split the usable rows into index/prompt/completion columns
+            # and derive each output column in one pass (IDs hashed as a batch)
+            rows = [(i, item.get("prompt", ""), item.get("completion", "")) for i, item in enumerate(items)]
+            rows = [row for row in rows if row[1] and row[2]]
+            indices, prompts, completions = zip(*rows) if rows else ((), (), ())
+    
+            ids = generate_ids_batch(prompts)
+            # formatted content for RAG
+            texts = [f"User Request: {prompt}\n\nExpert Recommendation: {completion}" for prompt, completion in zip(prompts, completions)]
+    
+            docs.extend(
+                {
+                    "id": f"reddit_{prompt_id}",
                     "structData": {
-                        "title": name,
+                        "title": f"Community Build Advice: {prompt[:50]}...",
                         "description": text_content,
-                        "content": text_content, # Explicit content field for search
-                        "url": f"https://pcpartpicker.com/product/{item_id}",
-                        "filepath": filename,
-                        "type": component_type,
-                        "price": str(price) if price else "N/A",
-                        "specs": json.dumps(item) # Stringify specs to avoid schema issues
+                        "url": f"https://reddit.com/advice/{i}", 
+                        "type": "Community Advice",
+                        "source": "Reddit",
+                        "price": "N/A"
                     }
                 }
-                
-                master_data.append(doc)
-
+                for i, prompt, prompt_id, text_content in zip(indices, prompts, ids, texts)
+            )
         except Exception as e:
-            print(f"Error processing {filename}: {e}")
+            print(f"Error processing Reddit file {filename}: {e}")
+        return docs
+    
+    # --- PROCESS PC PART DATA ---
+    component_type = COMPONENT_MAP_CF.get(file_key) or filename.replace(".json", "").replace("-", " ").title()
+    print(f"Processing {filename} as {component_type}...")
+    
+    try:
+        items = read_json_file(file_path, file_size)
+    
+        if not isinstance(items, list):
+            print(f"Warning: {filename} does not contain a list of items. Skipping.")
+            return docs
+    
+        type_header = f"Component Type: {component_type}"
+        id_prefix = f"{component_type}_"
+        for item in items:
+            # 1. rich description
+            description_parts = [type_header]
+            description_parts += [
+                f"{FIELD_LABELS[key]}: {value}"
+                for key, value in item.items()
+                if value is not None and value != ""
+            ]
+    
+            text_content = ". ".join(description_parts)
+    
+            # 2. Consistent Schema
+            # Remove complex nested objects from root to prevent schema drift
+            # Put everything complex into structData
+    
+            name = item.get("name", "Unknown Component")
+            price = item.get("price")
+    
+            # Sanitize ID: safe characters only (spaces become "_" like every other symbol)
+            item_id = (id_prefix + str(name)).translate(ID_SANITIZE_TABLE)[:128]
+    
+            doc = {
+                "id": item_id,
+                "structData": {
+                    "title": name,
+                    "description": text_content,
+                    "content": text_content, # Explicit content field for search
+                    "url": PART_URL_PREFIX + item_id,
+                    "filepath": filename,
+                    "type": component_type,
+                    "price": str(price) if price else "N/A",
+                    "specs": orjson.dumps(item).decode() # Stringify specs to avoid schema issues
+                }
+            }
+    
+            docs.append(doc)
+    
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+
+    return docs
+
+def serialize_file(file_path, filename, file_size):
+    """process_file() output as ready-to-write JSONL bytes, plus the document count."""
+    docs = process_file(file_path, filename, file_size)
+    dumps, newline = orjson.dumps, orjson.OPT_APPEND_NEWLINE
+    return len(docs), b"".join([dumps(doc, option=newline) for doc in docs])
+
+def load_and_process_data(input_dir, output_file):
+    total_docs = 0
+    
+    # Get all JSON files in the directory (one scan; DirEntry caches the stat)
+    json_files = [
+        entry for entry in os.scandir(input_dir)
+        if entry.name.endswith(".json") and entry.is_file()
+    ]
+    
+    print(f"Found {len(json_files)} JSON files.")
+
+    # Files are independent and parsing/formatting is CPU-bound, so fan out across
+    # processes (threads would serialize on the GIL). map() keeps the file order.
+    paths = [entry.path for entry in json_files]
+    names = [entry.name for entry in json_files]
+    sizes = [entry.stat().st_size for entry in json_files]
 
-    # Save to JSONL
-    with open(output_file, "w", encoding="utf-8") as f:
-        for entry in master_data:
-            json.dump(entry, f)
-            f.write("\n")
+    # Stream to JSONL as each file finishes: only one file's output is held at a time,
+    # and workers hand back bytes instead of pickled dicts
+    with open(output_file, "wb", buffering=IO_BUFFER_SIZE) as f, \
+            ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for count, chunk in executor.map(serialize_file, paths, names, sizes, chunksize=1):
+            f.write(chunk)
+            total_docs += count
 
-    print(f"Successfully processed {len(master_data)} items into {output_file}")
+    print(f"Successfully processed {total_docs} items into {output_file}")
 
 if __name__ == "__main__":
     INPUT_DIR = os.path.dirname(os.path.abspath(__file__))
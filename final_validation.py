@@ -1,17 +1,24 @@
-from fastapi.testclient import TestClient
+import asyncio
+
+import httpx
 from app import app
 
-client = TestClient(app)
+async def run_all(queries):
+    """POST every query to /chat concurrently so the Gemini calls overlap."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        return await asyncio.gather(*[client.post("/chat", json={"message": query}) for query in queries])
 
 def test_chat():
     queries = [
         "Search for AMD processors",
         "Tell me about the RTX 5090"
     ]
-    
-    for query in queries:
+
+    responses = asyncio.run(run_all(queries))
+
+    for query, response in zip(queries, responses):
         print(f"\nUser: {query}")
-        response = client.post("/chat", json={"message": query})
         if response.status_code == 200:
             print(f"BuildBuddy: {response.json()['response']}")
         else:
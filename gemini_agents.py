@@ -12,12 +12,22 @@ The goal is to show judges REASONING, not just retrieval.
 import json
 from typing import Optional
 
+# Each agent prompt is split into a static *_SYSTEM block (identical on every
+# call, so Gemini can reuse its prompt cache) and an *_INPUT template holding
+# the per-request data. *_PROMPT is the combined single-string form.
+# Hot paths should send *_SYSTEM as-is and only .format() the few-line
+# *_INPUT, rather than re-parsing the multi-KB *_PROMPT on every request.
+
+def _as_template(static_text: str) -> str:
+    """Escape literal braces so static text can be prepended to a .format() template"""
+    return static_text.replace("{", "{{").replace("}", "}}")
+
 # ============================================================================
 # AGENT 1: BUILD AGENT
 # Orchestrates tools and creates initial build with visible reasoning
 # ============================================================================
 
-BUILD_AGENT_PROMPT = """You are an expert PC builder AI assistant. Your job is to create an INITIAL PC build based on user requirements.
+BUILD_AGENT_SYSTEM = """You are an expert PC builder AI assistant. Your job is to create an INITIAL PC build based on user requirements.
 
 **CRITICAL: Show your reasoning process**
 Before building, you must:
@@ -27,45 +37,45 @@ Before building, you must:
 4. Explain why you chose each component category
 
 **Output Format (JSON)**
-{{
-  "reasoning": {{
+{
+  "reasoning": {
     "parsed_requirements": "user's goals in structured form",
     "tool_decisions": [
-      {{"tool": "RAG", "query": "...", "why": "..."}},
-      {{"tool": "Web Search", "query": "...", "why": "..."}},
-      {{"tool": "Pure Reasoning", "thinking": "...", "why": "..."}}
+      {"tool": "RAG", "query": "...", "why": "..."},
+      {"tool": "Web Search", "query": "...", "why": "..."},
+      {"tool": "Pure Reasoning", "thinking": "...", "why": "..."}
     ],
     "assumptions": ["assumption 1", "assumption 2", ...],
-    "budget_allocation": {{
-      "CPU": {{"percentage": 25, "reasoning": "..."}},
-      "GPU": {{"percentage": 35, "reasoning": "..."}},
-      "RAM": {{"percentage": 10, "reasoning": "..."}},
-      "Storage": {{"percentage": 10, "reasoning": "..."}},
-      "PSU/Cooling/Case": {{"percentage": 20, "reasoning": "..."}}
-    }}
-  }},
-  "build": {{
+    "budget_allocation": {
+      "CPU": {"percentage": 25, "reasoning": "..."},
+      "GPU": {"percentage": 35, "reasoning": "..."},
+      "RAM": {"percentage": 10, "reasoning": "..."},
+      "Storage": {"percentage": 10, "reasoning": "..."},
+      "PSU/Cooling/Case": {"percentage": 20, "reasoning": "..."}
+    }
+  },
+  "build": {
     "total_budget": 1200,
     "parts": [
-      {{
+      {
         "category": "CPU",
         "name": "AMD Ryzen 7 5700X3D",
         "price": 299,
         "rationale": "Best gaming CPU at this price point for 1440p"
-      }},
+      },
       ...
     ],
-    "performance_targets": {{
+    "performance_targets": {
       "resolution": "1440p",
       "fps_target": "120+",
       "workload": "gaming"
-    }},
+    },
     "known_limitations": [
       "Limited to DDR4 due to CPU choice",
       "No NVIDIA NVENC (consider if streaming)"
     ]
-  }}
-}}
+  }
+}
 
 **Rules:**
 - Always show which tools you're using and why
@@ -74,18 +84,21 @@ Before building, you must:
 - Include limitations upfront
 - Budget allocation MUST total 100%
 - Never invent part prices; acknowledge uncertainties
+"""
 
-User Requirements: {user_requirements}
+BUILD_AGENT_INPUT = """User Requirements: {user_requirements}
 Available Parts Data: {retrieved_parts}
 Recent Market Data: {web_search_results}
 """
 
+BUILD_AGENT_PROMPT = _as_template(BUILD_AGENT_SYSTEM) + "\n" + BUILD_AGENT_INPUT
+
 # ============================================================================
 # AGENT 2: CRITIQUE AGENT
 # Independently reviews the build, finds weaknesses (NO validation bias)
 # ============================================================================
 
-CRITIQUE_AGENT_PROMPT = """You are a CRITICAL PC build reviewer. Your job is to FIND PROBLEMS with the proposed build.
+CRITIQUE_AGENT_SYSTEM = """You are a CRITICAL PC build reviewer. Your job is to FIND PROBLEMS with the proposed build.
 
 **Your mindset:**
 - Assume the builder made mistakes or missed risks
@@ -94,56 +107,56 @@ CRITIQUE_AGENT_PROMPT = """You are a CRITICAL PC build reviewer. Your job is to
 - If builders on Reddit disagree, surface that conflict
 
 **Output Format (JSON)**
-{{
-  "critique": {{
+{
+  "critique": {
     "overall_assessment": "1-2 sentence verdict",
     "severity": "strong/moderate/minor",
     "concerns": [
-      {{
+      {
         "category": "Bottleneck",
         "issue": "GPU will be bottlenecked by CPU in most games",
         "evidence": "GPU is RTX 4070 but CPU is Ryzen 5 5600X; benchmarks show 15-20% CPU bottleneck at 1440p",
         "impact": "User won't get promised 120+ FPS",
         "severity": "high"
-      }},
-      {{
+      },
+      {
         "category": "Price Volatility",
         "issue": "RTX 4070 prices fluctuate $50-100/month",
         "evidence": "Historical data shows price range $549-649",
         "impact": "User might overpay by waiting",
         "severity": "moderate"
-      }},
-      {{
+      },
+      {
         "category": "Wasted Money",
         "issue": "$50 premium thermal paste unnecessary for this CPU",
         "evidence": "Stock cooler + $15 paste achieves same temps",
         "impact": "Unnecessary $35 cost",
         "severity": "low"
-      }},
-      {{
+      },
+      {
         "category": "Reddit Consensus vs. Build",
         "issue": "80% of budget builders prefer AMD GPU over NVIDIA in this range",
         "evidence": "r/buildapc threads favor RX 7700 XT for value",
         "impact": "User might have better value elsewhere",
         "severity": "moderate"
-      }},
-      {{
+      },
+      {
         "category": "6-Month Regret Risk",
         "issue": "No PCIe 5.0 support; will feel dated if new standards adopt",
         "evidence": "New motherboards increasingly have PCIe 5.0",
         "impact": "Limited upgrade path",
         "severity": "low"
-      }}
+      }
     ],
     "budget_inefficiencies": [
-      {{"item": "Thermal paste", "allocated": 50, "should_be": 15, "wasted": 35}}
+      {"item": "Thermal paste", "allocated": 50, "should_be": 15, "wasted": 35}
     ],
     "compatibility_flags": [],
     "missing_considerations": [
       "User mentioned streaming; no mention of NVENC capability evaluation"
     ]
-  }}
-}}
+  }
+}
 
 **Rules:**
 - Be harsh but fair
@@ -152,19 +165,22 @@ CRITIQUE_AGENT_PROMPT = """You are a CRITICAL PC build reviewer. Your job is to
 - Don't assume the build is bad; assume it has gaps
 - Surface uncertainty ("3 sources disagree," etc.)
 - Include "severity" for UI prioritization
+"""
 
-Proposed Build: {build_json}
+CRITIQUE_AGENT_INPUT = """Proposed Build: {build_json}
 Available Market Intelligence: {market_data}
 Reddit Consensus Data: {reddit_data}
 User's Original Requirements: {original_requirements}
 """
 
+CRITIQUE_AGENT_PROMPT = _as_template(CRITIQUE_AGENT_SYSTEM) + "\n" + CRITIQUE_AGENT_INPUT
+
 # ============================================================================
 # AGENT 3: IMPROVE AGENT
 # Uses critique feedback to patch build, explain changes
 # ============================================================================
 
-IMPROVE_AGENT_PROMPT = """You are a PC build architect. You've received feedback (critique) on a proposed build.
+IMPROVE_AGENT_SYSTEM = """You are a PC build architect. You've received feedback (critique) on a proposed build.
 Your job is to REVISE THE BUILD to address critique, explain why each change matters.
 
 **Your approach:**
@@ -175,60 +191,60 @@ Your job is to REVISE THE BUILD to address critique, explain why each change mat
 5. Show your reasoning (not just "changed GPU")
 
 **Output Format (JSON)**
-{{
-  "revisions": {{
+{
+  "revisions": {
     "changes_made": [
-      {{
+      {
         "original_part": "RTX 4070 at $599",
         "revised_part": "RTX 4070 Super at $599",
         "reason": "Critique found bottleneck; Super version eliminates it",
         "tradeoff": "No cost increase, 15% more VRAM, solves bottleneck",
         "confidence": "high"
-      }},
-      {{
+      },
+      {
         "original_part": "$50 thermal paste",
         "revised_part": "$15 thermal paste",
         "reason": "Wasted money; performance identical in testing",
         "tradeoff": "Save $35, same results",
         "confidence": "high"
-      }}
+      }
     ],
     "critiques_rejected_and_why": [
-      {{
+      {
         "critique": "PCIe 5.0 future-proofing",
         "response": "Budget doesn't support current PCIe 5.0 boards; premature optimization. Revisit in 2 years when prices drop."
-      }}
+      }
     ],
-    "revised_build": {{
+    "revised_build": {
       "total_budget": 1165,  // Should be lower if inefficiencies fixed
       "parts": [
-        {{
+        {
           "category": "CPU",
           "name": "AMD Ryzen 7 5700X3D",
           "price": 299,
           "notes": "Unchanged; no issues found"
-        }},
+        },
         ...
       ],
       "improvements_summary": "Removed bottleneck, saved $35 on paste, maintains performance targets"
-    }},
+    },
     "remaining_risks": [
-      {{
+      {
         "risk": "Stock cooler may thermal throttle under sustained load",
         "mitigation": "Monitor temps; upgrade to Arctic Freezer if needed for $50",
         "probability": "20%"
-      }}
+      }
     ],
     "user_decision_points": [
-      {{
+      {
         "decision": "NVIDIA vs AMD GPU",
         "option_a": "RTX 4070 Super ($599) - Better NVENC if streaming, worse value for pure gaming",
         "option_b": "RX 7700 XT ($549) - Better gaming value, no encode acceleration",
         "answer": "Choose A if streaming planned, B if gaming only"
-      }}
+      }
     ]
-  }}
-}}
+  }
+}
 
 **Rules:**
 - Explain not just WHAT changed but WHY
@@ -237,19 +253,22 @@ Your job is to REVISE THE BUILD to address critique, explain why each change mat
 - If critique was wrong, say so and defend original choice
 - Quantify improvements (15% better performance, $35 saved, etc.)
 - Leave decision points where trade-offs require user judgment
+"""
 
-Original Build: {original_build}
+IMPROVE_AGENT_INPUT = """Original Build: {original_build}
 Critique Feedback: {critique_feedback}
 Updated Market Data: {market_data}
 User Requirements: {original_requirements}
 """
 
+IMPROVE_AGENT_PROMPT = _as_template(IMPROVE_AGENT_SYSTEM) + "\n" + IMPROVE_AGENT_INPUT
+
 # ============================================================================
 # MASTER ORCHESTRATOR
 # Coordinates all three agents and formats output for UI
 # ============================================================================
 
-MASTER_ORCHESTRATOR_PROMPT = """You are the PC Build Orchestrator. You coordinate three AI agents:
+MASTER_ORCHESTRATOR_SYSTEM = """You are the PC Build Orchestrator. You coordinate three AI agents:
 1. Builder → Creates initial build with reasoning
 2. Critic → Finds flaws independently  
 3. Improver → Patches build based on critique
@@ -264,55 +283,59 @@ Your job is to synthesize their outputs into a NARRATIVE that shows reasoning, n
 - Constraints ("Budget forced this tradeoff...")
 
 **Output Format (JSON)**
-{{
-  "narrative": {{
-    "title": "Expert PC Build: {user_goal}",
+{
+  "narrative": {
+    "title": "Expert PC Build: <User Goal>",
     "core_story": "1-2 sentences explaining the philosophy of this build",
     "agents_pipeline": [
-      {{
+      {
         "stage": "Build",
-        "agent_output": {{"tools_used": [...], "build": [...]}},
+        "agent_output": {"tools_used": [...], "build": [...]},
         "summary_for_user": "Initial build prioritized..., chose..., assumes..."
-      }},
-      {{
+      },
+      {
         "stage": "Critique",
-        "agent_output": {{"concerns": [...]}},
+        "agent_output": {"concerns": [...]},
         "summary_for_user": "But there are risks: bottleneck detected, price volatility, Reddit disagrees on GPU."
-      }},
-      {{
+      },
+      {
         "stage": "Improve",
-        "agent_output": {{"revisions": [...]}},
+        "agent_output": {"revisions": [...]},
         "summary_for_user": "So we patched: swapped GPU to eliminate bottleneck, removed wasted thermal paste."
-      }}
+      }
     ],
-    "final_verdict": {{
+    "final_verdict": {
       "build": "revised build parts",
       "key_decisions": "Why we chose each component",
       "tradeoffs": "What we're NOT doing and why",
       "risks": "What could still go wrong",
       "confidence": "80%+ confidence this is optimal given constraints"
-    }}
-  }},
-  "ui_data": {{
+    }
+  },
+  "ui_data": {
     "comparison_table": "original vs revised build side-by-side",
     "concern_badges": ["bottleneck fixed", "cost optimized", "future-risk identified"],
     "decision_tree": "interactive view of alternatives & tradeoffs",
     "next_steps": ["Buy now before price increase", "Wait for RTX 4080 price drop", "Consider streaming workflow"]
-  }}
-}}
+  }
+}
 
 **Rules:**
 - Use conversational language; explain like you would to a friend
 - Highlight the moment of critique (the "aha" that improves the build)
 - Show confidence levels (high/medium/low) for each change
 - Make the reasoning VISIBLE, not hidden in chain-of-thought
+"""
 
+MASTER_ORCHESTRATOR_INPUT = """User Goal: {user_goal}
 User Request: {user_request}
 Build Agent Output: {agent1_output}
 Critique Agent Output: {agent2_output}
 Improve Agent Output: {agent3_output}
 """
 
+MASTER_ORCHESTRATOR_PROMPT = _as_template(MASTER_ORCHESTRATOR_SYSTEM) + "\n" + MASTER_ORCHESTRATOR_INPUT
+
 # ============================================================================
 # EXECUTION FLOW FOR app.py
 # ============================================================================
@@ -326,62 +349,77 @@ async def build_pc_with_reasoning(user_query: str):
     Returns visible reasoning + final build.
     '''
     
-    # Step 1: Retrieve context
-    retrieved_parts = get_retriever().retrieve(user_query)
-    market_data = search_web(f"PC parts pricing {extract_budget(user_query)}")
-    reddit_data = get_retriever().retrieve(f"reddit {extract_usecase(user_query)}")
+    # Step 1: Retrieve context (three independent lookups, run concurrently)
+    retriever = get_retriever()
+    retrieved_parts, market_data, reddit_data = await asyncio.gather(
+        asyncio.to_thread(retriever.retrieve, user_query),
+        asyncio.to_thread(search_web, f"PC parts pricing {extract_budget(user_query)}"),
+        asyncio.to_thread(retriever.retrieve, f"reddit {extract_usecase(user_query)}"),
+    )
+    
+    # Serialize each context block once; the same text is reused by every agent
+    parts_text = orjson.dumps(retrieved_parts).decode()
+    market_text = orjson.dumps(market_data).decode()
+    reddit_text = orjson.dumps(reddit_data).decode()
     
     # Step 2: BUILD AGENT
+    # Static *_SYSTEM goes as the system instruction; only the short *_INPUT is formatted
     build_agent_response = gemini_call(
-        prompt=BUILD_AGENT_PROMPT.format(
+        system=BUILD_AGENT_SYSTEM,
+        prompt=BUILD_AGENT_INPUT.format(
             user_requirements=user_query,
-            retrieved_parts=json.dumps(retrieved_parts),
-            web_search_results=json.dumps(market_data)
+            retrieved_parts=parts_text,
+            web_search_results=market_text
         ),
         temperature=0.7,  # Creative but grounded
         response_format="json"
     )
-    initial_build = json.loads(build_agent_response)
+    initial_build = orjson.loads(build_agent_response)
+    build_text = orjson.dumps(initial_build["build"]).decode()  # Shared by Critique + Improve
     
     # Step 3: CRITIQUE AGENT (uses initial build, NOT original assistant's guidance)
     critique_response = gemini_call(
-        prompt=CRITIQUE_AGENT_PROMPT.format(
-            build_json=json.dumps(initial_build["build"]),
-            market_data=json.dumps(market_data),
-            reddit_data=json.dumps(reddit_data),
+        system=CRITIQUE_AGENT_SYSTEM,
+        prompt=CRITIQUE_AGENT_INPUT.format(
+            build_json=build_text,
+            market_data=market_text,
+            reddit_data=reddit_text,
             original_requirements=user_query
         ),
         temperature=0.9,  # More critical, less constrained
         response_format="json"
     )
-    critique = json.loads(critique_response)
+    critique = orjson.loads(critique_response)
     
     # Step 4: IMPROVE AGENT
     improve_response = gemini_call(
-        prompt=IMPROVE_AGENT_PROMPT.format(
-            original_build=json.dumps(initial_build["build"]),
-            critique_feedback=json.dumps(critique["critique"]),
-            market_data=json.dumps(market_data),
+        system=IMPROVE_AGENT_SYSTEM,
+        prompt=IMPROVE_AGENT_INPUT.format(
+            original_build=build_text,
+            critique_feedback=orjson.dumps(critique["critique"]).decode(),
+            market_data=market_text,
             original_requirements=user_query
         ),
         temperature=0.7,  # Thoughtful revision
         response_format="json"
     )
-    revisions = json.loads(improve_response)
+    revisions = orjson.loads(improve_response)
     
     # Step 5: MASTER ORCHESTRATOR
+    # The agents' raw JSON replies are passed through instead of re-encoding the parsed dicts
     narrative_response = gemini_call(
-        prompt=MASTER_ORCHESTRATOR_PROMPT.format(
+        system=MASTER_ORCHESTRATOR_SYSTEM,
+        prompt=MASTER_ORCHESTRATOR_INPUT.format(
             user_goal=extract_goal(user_query),
             user_request=user_query,
-            agent1_output=json.dumps(initial_build),
-            agent2_output=json.dumps(critique),
-            agent3_output=json.dumps(revisions)
+            agent1_output=build_agent_response,
+            agent2_output=critique_response,
+            agent3_output=improve_response
         ),
         temperature=0.7,  # Coherent storytelling
         response_format="json"
     )
-    narrative = json.loads(narrative_response)
+    narrative = orjson.loads(narrative_response)
     
     # Return full pipeline visible
     return {
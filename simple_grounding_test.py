@@ -4,7 +4,8 @@ from vertexai.preview.generative_models import GenerativeModel, Tool, grounding
 PROJECT_ID = "uga-hacks11"
 LOCATION = "us-central1"
 
-vertexai.init(project=PROJECT_ID, location=LOCATION)
+# Pin the gRPC transport: one persistent HTTP/2 channel per model client
+vertexai.init(project=PROJECT_ID, location=LOCATION, api_transport="grpc")
 
 def test_grounding():
     print("Initializing model...")
@@ -26,7 +26,16 @@ fi
 # Start backend
 echo "[1/2] Starting FastAPI Backend on port 8000..."
 echo ""
-python app.py &
+if command -v gunicorn >/dev/null 2>&1; then
+    # A couple of uvicorn workers (uvloop + httptools) is plenty: requests spend
+    # their time waiting on Vertex AI, not on CPU. Each worker has its own
+    # VERTEX_MAX_CONCURRENCY slots and its own caches, so the project-wide cap on
+    # in-flight Vertex calls is WEB_CONCURRENCY x VERTEX_MAX_CONCURRENCY
+    WORKERS=${WEB_CONCURRENCY:-2}
+    gunicorn app:app -k uvicorn.workers.UvicornWorker -w "$WORKERS" -b 0.0.0.0:8000 &
+else
+    python app.py &
+fi
 BACKEND_PID=$!
 
 sleep 3
@@ -1,21 +1,28 @@
-from fastapi.testclient import TestClient
+import asyncio
+
+import httpx
 from app import app
 import sys
 
-client = TestClient(app)
+async def post_chats(queries):
+    """POST every query to /chat concurrently over one in-process ASGI client"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        return await asyncio.gather(*[client.post("/chat", json={"message": query}) for query in queries])
 
 def test_chat():
     print("Sending request to /chat...")
     # Ask a question that requires RAG
-    query = "Recommend a CPU for a budget gaming PC"
-    response = client.post("/chat", json={"message": query})
-    
-    if response.status_code == 200:
-        print("\nSuccess! API Response:")
-        print(response.json())
-    else:
-        print(f"\nFailed with status {response.status_code}:")
-        print(response.text)
+    queries = ["Recommend a CPU for a budget gaming PC"]
+    responses = asyncio.run(post_chats(queries))
+
+    for response in responses:
+        if response.status_code == 200:
+            print("\nSuccess! API Response:")
+            print(response.json())
+        else:
+            print(f"\nFailed with status {response.status_code}:")
+            print(response.text)
 
 if __name__ == "__main__":
     test_chat()
@@ -1,28 +1,33 @@
-import requests
-import json
-import time
+import asyncio
 
-url = "http://localhost:8000/build-pc"
+import httpx
+
+batch_url = "http://localhost:8000/build-pc-batch"
 queries = [
     "Build me a pink gaming PC",
     "I want an all-white streaming setup",
     "A powerful black RGB workstation"
 ]
 
+async def post_batch(queries):
+    """Send every query in one /build-pc-batch call; the server runs the pipelines together"""
+    async with httpx.AsyncClient(timeout=None) as client:
+        response = await client.post(batch_url, json={"queries": queries, "verbose": False})
+        response.raise_for_status()
+        return response.json()["results"]
+
 print("Testing Dynamic Visualization Fallback...")
 
-for query in queries:
-    payload = {
-        "query": query,
-        "verbose": False
-    }
-    
+try:
+    results = asyncio.run(post_batch(queries))
+except Exception as e:
+    # Server down, a backend without /build-pc-batch, or an HTTP error: report it per query
+    results = [{"status": "error", "detail": f"{type(e).__name__}: {e}"}] * len(queries)
+
+for query, data in zip(queries, results):
     print(f"\nQuery: '{query}'")
     try:
-        response = requests.post(url, json=payload)
-        
-        if response.status_code == 200:
-            data = response.json()
+        if data.get("status") == "success":
             viz = data.get("reasoning", {}).get("stage_4_visualization", {})
             
             print(f"Source: {viz.get('source')}")
@@ -37,7 +42,7 @@ for query in queries:
                 print("✅ match")
                 
         else:
-            print(f"❌ Error {response.status_code}")
+            print(f"❌ Error: {data.get('detail')}")
 
     except Exception as e:
         print(f"❌ Exception: {e}")
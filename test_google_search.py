@@ -1,13 +1,21 @@
 import os
-from langchain_google_vertexai import ChatVertexAI
-from langchain.tools import Tool, tool
-from google.cloud import discoveryengine_v1beta as discoveryengine
+from functools import lru_cache
 
 PROJECT_ID = "uga-hacks11"
 LOCATION = "us-central1"
 
 print(f"Testing Google Search Grounding for {PROJECT_ID}...")
 
+@lru_cache(maxsize=1)
+def get_grounded_model():
+    """Gemini model + Google Search grounding tool, built once per run"""
+    from vertexai.preview.generative_models import GenerativeModel, Tool
+    from vertexai.preview.generative_models import grounding
+    
+    model = GenerativeModel("gemini-2.0-flash-exp")
+    tools = [Tool.from_google_search_retrieval(grounding.GoogleSearchRetrieval())]
+    return model, tools
+
 def search_google(query: str):
     """Searches Google for real-time information."""
     # Note: Vertex AI Search Grounding is typically done via the model directly
@@ -15,11 +23,7 @@ def search_google(query: str):
     # However, for the hackathon, the easiest way to get "Grounding" is using the 
     # `tools=[GoogleSearchRetrieval]` in Gemini.
     
-    from vertexai.preview.generative_models import GenerativeModel, Tool
-    from vertexai.preview.generative_models import grounding
-    
-    model = GenerativeModel("gemini-2.0-flash-exp")
-    tools = [Tool.from_google_search_retrieval(grounding.GoogleSearchRetrieval())]
+    model, tools = get_grounded_model()
     
     response = model.generate_content(
         query,
@@ -31,7 +35,8 @@ def search_google(query: str):
 
 try:
     import vertexai
-    vertexai.init(project=PROJECT_ID, location=LOCATION)
+    # Pin the gRPC transport: one persistent HTTP/2 channel per model client
+    vertexai.init(project=PROJECT_ID, location=LOCATION, api_transport="grpc")
     
     query = "current price of RTX 4090"
     print(f"Querying: {query}")
@@ -3,6 +3,8 @@ import json
 import time
 
 url = "http://localhost:8000/build-pc"
+# One keep-alive session for every call (re-running from a REPL reuses the connection)
+session = requests.Session()
 payload = {
     "query": "A futuristic white gaming PC with RGB, $2500 budget",
     "verbose": True
@@ -13,7 +15,7 @@ print(f"Sending request to {url}...")
 
 try:
     start_time = time.time()
-    response = requests.post(url, json=payload)
+    response = session.post(url, json=payload, timeout=120)
     end_time = time.time()
     
     if response.status_code == 200: